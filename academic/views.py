@@ -3,11 +3,16 @@ from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
 from django.http import JsonResponse
 from django.db.models import Q
+from accounts.roles import get_roles
+
 from .models import AcademicYear, Subject, Class, ClassRoutine
 from .forms import AcademicYearForm, SubjectForm, ClassForm, ClassRoutineForm
 
+def is_admin(user):
+    return get_roles(user).is_admin
+
 def is_teacher_or_admin(user):
-    return user.groups.filter(name__in=['Teachers', 'Admins']).exists() or user.is_superuser
+    return get_roles(user).is_teacher_or_admin
 
 @login_required
 def academic_year_list(request):
@@ -17,7 +22,7 @@ def academic_year_list(request):
     })
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser or u.groups.filter(name='Admins').exists())
+@user_passes_test(is_admin)
 def academic_year_create(request):
     if request.method == 'POST':
         form = AcademicYearForm(request.POST)
@@ -34,7 +39,7 @@ def academic_year_create(request):
     })
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser or u.groups.filter(name='Admins').exists())
+@user_passes_test(is_admin)
 def academic_year_edit(request, pk):
     academic_year = get_object_or_404(AcademicYear, pk=pk)
     
@@ -53,7 +58,7 @@ def academic_year_edit(request, pk):
     })
 
 @login_required
-@user_passes_test(lambda u: u.is_superuser or u.groups.filter(name='Admins').exists())
+@user_passes_test(is_admin)
 def academic_year_delete(request, pk):
     academic_year = get_object_or_404(AcademicYear, pk=pk)
     
@@ -6,6 +6,7 @@ from django.conf import settings
 import random
 import string
 from django.contrib.auth.models import User
+from .roles import get_roles
 
 class UserProfile(models.Model):
     user = models.OneToOneField(settings.AUTH_USER_MODEL, on_delete=models.CASCADE)
@@ -54,6 +55,11 @@ class User(AbstractUser):
     def __str__(self):
         return f"{self.username} ({self.get_user_type_display()})"
 
+    @property
+    def roles(self):
+        """Group-based roles, resolved once per request (see accounts.roles)"""
+        return get_roles(self)
+
     def get_profile_picture_url(self):
         """Return profile picture URL or default"""
         if self.profile_picture and hasattr(self.profile_picture, 'url'):
@@ -0,0 +1,56 @@
+"""
+Role resolution.
+
+Permission checks used to run a ``user.groups.filter(...).exists()`` query
+each, several times per request. A user's group names are now loaded with
+one query and memoized on the user object for the rest of the request;
+``user.roles`` answers every role check from them. They are deliberately
+not cached across requests, so a revoked role stops applying on the very
+next request in every worker.
+"""
+from django.contrib.auth.models import Group
+
+TEACHERS = 'Teachers'
+STUDENTS = 'Students'
+ADMINS = 'Admins'
+
+
+class Roles:
+    def __init__(self, groups=frozenset(), is_staff=False, is_superuser=False):
+        self.groups = frozenset(groups)
+        self.is_staff = is_staff
+        self.is_superuser = is_superuser
+
+    def __contains__(self, group):
+        return group in self.groups
+
+    @property
+    def is_teacher(self):
+        return TEACHERS in self.groups or self.is_staff
+
+    @property
+    def is_student(self):
+        return STUDENTS in self.groups
+
+    @property
+    def is_admin(self):
+        return ADMINS in self.groups or self.is_superuser
+
+    @property
+    def is_teacher_or_admin(self):
+        return TEACHERS in self.groups or self.is_admin
+
+
+def group_names(user_id):
+    return frozenset(Group.objects.filter(user=user_id).values_list('name', flat=True))
+
+
+def get_roles(user):
+    """Return the roles of ``user``, resolved once per user object."""
+    if not user.is_authenticated:
+        return Roles()
+    roles = getattr(user, '_roles', None)
+    if roles is None:
+        roles = Roles(group_names(user.pk), user.is_staff, user.is_superuser)
+        user._roles = roles
+    return roles
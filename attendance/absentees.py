@@ -0,0 +1,137 @@
+"""
+Chronic-absentee detection.
+
+``scan_absentees`` keeps ``AbsenteeRisk`` up to date for every student:
+the current and longest run of consecutive absent periods, and the absence
+rate over the last few months, taken from ``MonthlyReport``. Streaks are
+recomputed from the live records of every student with a record added or
+changed since the last run (by id and ``updated_at``), so status
+corrections and records synced late for earlier dates are taken into
+account. Dashboards read the precomputed rows instead of scanning
+attendance per student.
+"""
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Max, Q, Sum
+from django.utils import timezone
+
+from .models import AbsenteeRisk, AbsenteeScanCheckpoint, AttendanceRecord, MonthlyReport
+
+CHECKPOINT_NAME = 'absentee_risk'
+
+CHUNK_SIZE = 5000
+
+# Students whose records are replayed per query
+STUDENT_CHUNK_SIZE = 500
+
+RISK_FIELDS = ['current_streak', 'longest_streak', 'absence_rate', 'is_chronic', 'last_record_date']
+
+
+def scan_absentees(rate_threshold=10.0, streak_threshold=3, months=3, today=None):
+    """
+    Bring ``AbsenteeRisk`` up to date; returns ``(records_scanned, chronic_count)``.
+
+    Every student with a record above the stored id checkpoint, or updated
+    since the previous scan started, has their streaks rebuilt from all of
+    their live records in date/period order. A student is chronic when their
+    absence rate over the last ``months`` months reaches ``rate_threshold``
+    percent or they have missed at least ``streak_threshold`` periods in a
+    row. Excused periods neither extend nor break a streak.
+    """
+    today = today or date.today()
+    # Taken before reading, so a change made during the scan is seen by the next one
+    started = timezone.now()
+    checkpoint, _ = AbsenteeScanCheckpoint.objects.get_or_create(name=CHECKPOINT_NAME)
+
+    risks = {risk.student_id: risk for risk in AbsenteeRisk.objects.all()}
+    original = {student_id: risk_values(risk) for student_id, risk in risks.items()}
+
+    def risk_for(student_id):
+        if student_id not in risks:
+            risks[student_id] = AbsenteeRisk(student_id=student_id)
+        return risks[student_id]
+
+    last_record_id = AttendanceRecord.objects.aggregate(last=Max('id'))['last'] or 0
+    changed = Q(id__gt=checkpoint.last_record_id, id__lte=last_record_id)
+    if checkpoint.last_scanned_at is not None:
+        changed |= Q(updated_at__gte=checkpoint.last_scanned_at)
+    student_ids = sorted(AttendanceRecord.objects.filter(changed).values_list('student_id', flat=True).distinct().order_by())
+
+    scanned = 0
+    for index in range(0, len(student_ids), STUDENT_CHUNK_SIZE):
+        chunk = student_ids[index:index + STUDENT_CHUNK_SIZE]
+        for student_id in chunk:
+            risk = risk_for(student_id)
+            risk.current_streak = risk.longest_streak = 0
+            risk.last_record_date = None
+
+        records = AttendanceRecord.objects.filter(student_id__in=chunk).values_list(
+            'student_id', 'status', 'attendance__date'
+        ).order_by('student_id', 'attendance__date', 'attendance__period', 'id').iterator(chunk_size=CHUNK_SIZE)
+
+        for student_id, status, day in records:
+            risk = risks[student_id]
+            if status == 'absent':
+                risk.current_streak += 1
+                risk.longest_streak = max(risk.longest_streak, risk.current_streak)
+            elif status in ('present', 'late'):
+                risk.current_streak = 0
+            risk.last_record_date = day
+            scanned += 1
+
+    rates = MonthlyReport.objects.filter(
+        recent_months(today, months)
+    ).values('student_id').annotate(
+        total=Sum('total_days'),
+        absent=Sum('absent_days'),
+    ).order_by()
+    rates = {
+        row['student_id']: round((row['absent'] / row['total']) * 100, 2) if row['total'] else 0
+        for row in rates
+    }
+    for student_id in rates:
+        risk_for(student_id)
+
+    for student_id, risk in risks.items():
+        risk.absence_rate = rates.get(student_id, 0)
+        risk.is_chronic = risk.absence_rate >= rate_threshold or risk.current_streak >= streak_threshold
+
+    now = timezone.now()
+    to_create = [risk for student_id, risk in risks.items() if student_id not in original]
+    to_update = [
+        risk for student_id, risk in risks.items()
+        if student_id in original and risk_values(risk) != original[student_id]
+    ]
+    for risk in to_update:
+        risk.updated_at = now
+
+    with transaction.atomic():
+        AbsenteeRisk.objects.bulk_create(to_create, batch_size=500)
+        AbsenteeRisk.objects.bulk_update(to_update, RISK_FIELDS + ['updated_at'], batch_size=500)
+        checkpoint.last_record_id = last_record_id
+        checkpoint.last_scanned_at = started
+        checkpoint.save(update_fields=['last_record_id', 'last_scanned_at', 'updated_at'])
+
+    return scanned, sum(1 for risk in risks.values() if risk.is_chronic)
+
+
+def risk_values(risk):
+    return tuple(getattr(risk, field) for field in RISK_FIELDS)
+
+
+def recent_months(today, months):
+    """Q matching ``MonthlyReport`` rows of the last ``months`` months, this one included."""
+    condition = Q(pk__in=[])
+    year, month = today.year, today.month
+    for _ in range(months):
+        condition |= Q(year=year, month=month)
+        year, month = (year - 1, 12) if month == 1 else (year, month - 1)
+    return condition
+
+
+def reset_absentee_scan():
+    """Forget all streaks so the next scan starts again from the first record."""
+    with transaction.atomic():
+        AbsenteeRisk.objects.all().delete()
+        AbsenteeScanCheckpoint.objects.filter(name=CHECKPOINT_NAME).delete()
@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Class, Subject, Student, Attendance, AttendanceRecord, MonthlyReport
+from .models import Class, Subject, Student, Attendance, AttendanceRecord, MonthlyReport, AbsenteeRisk, AttendanceArchive
 
 @admin.register(Class)
 class ClassAdmin(admin.ModelAdmin):
@@ -55,13 +55,18 @@ class AttendanceAdmin(admin.ModelAdmin):
     readonly_fields = ['created_at', 'updated_at']
     inlines = [AttendanceRecordInline]
     
+    def get_queryset(self, request):
+        return super().get_queryset(request).with_counts().select_related('class_info', 'subject', 'teacher')
+    
     def total_students(self, obj):
         return obj.total_students
     total_students.short_description = 'মোট শিক্ষার্থী'
+    total_students.admin_order_field = 'annotated_total_students'
     
     def present_count(self, obj):
         return obj.present_count
     present_count.short_description = 'উপস্থিত'
+    present_count.admin_order_field = 'annotated_present_count'
     
     def attendance_percentage(self, obj):
         return f"{obj.attendance_percentage}%"
@@ -76,7 +81,20 @@ class AttendanceRecordAdmin(admin.ModelAdmin):
 
 @admin.register(MonthlyReport)
 class MonthlyReportAdmin(admin.ModelAdmin):
-    list_display = ['student', 'month', 'year', 'total_days', 'present_days', 'attendance_percentage']
-    list_filter = ['month', 'year', 'student__class_info']
+    list_display = ['student', 'month', 'year', 'total_days', 'present_days', 'attendance_percentage', 'is_frozen']
+    list_filter = ['month', 'year', 'is_frozen', 'student__class_info']
+    search_fields = ['student__name', 'student__roll_number']
+    readonly_fields = ['attendance_percentage']
+
+@admin.register(AbsenteeRisk)
+class AbsenteeRiskAdmin(admin.ModelAdmin):
+    list_display = ['student', 'current_streak', 'longest_streak', 'absence_rate', 'is_chronic', 'last_record_date', 'updated_at']
+    list_filter = ['is_chronic', 'student__class_info']
     search_fields = ['student__name', 'student__roll_number']
-    readonly_fields = ['attendance_percentage']
\ No newline at end of file
+    readonly_fields = ['current_streak', 'longest_streak', 'absence_rate', 'is_chronic', 'last_record_date', 'updated_at']
+    raw_id_fields = ['student']
+
+@admin.register(AttendanceArchive)
+class AttendanceArchiveAdmin(admin.ModelAdmin):
+    list_display = ['year', 'database', 'attendance_count', 'record_count', 'archived_at']
+    readonly_fields = ['year', 'database', 'attendance_count', 'record_count', 'archived_at']
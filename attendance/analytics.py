@@ -0,0 +1,234 @@
+"""
+Columnar attendance analytics.
+
+School-wide trends (daily rate per class, subject and period, rolling
+averages, weekday seasonality) are computed over every attendance record,
+which is far too slow row by row through the ORM. Instead the records are
+pulled once, in chunks, into compact NumPy columns (status as ``int8`` codes,
+dates as day offsets) and every aggregate is a vectorised ``bincount``.
+
+The columns are cached on disk and brought up to date incrementally: records
+created after the cached ``created_at`` high-water mark are appended, while
+edits and deletes drop the cache so it is rebuilt on the next request.
+"""
+import os
+from datetime import date, timedelta
+
+import numpy as np
+from django.conf import settings
+from django.db.models import Case, Count, IntegerField, Max, Value, When
+from django.utils.dateparse import parse_datetime
+
+from .models import Attendance, AttendanceRecord, Class, Subject
+
+STATUS_CODES = {'present': 0, 'absent': 1, 'late': 2, 'excused': 3}
+
+EPOCH = date(2000, 1, 1)
+
+CHUNK_SIZE = 20000
+
+# Longest range attendance_trends is asked for; its arrays grow with the range
+MAX_RANGE_DAYS = 731
+
+COLUMNS = ['day', 'status', 'class_id', 'subject_id', 'period']
+
+DTYPES = {
+    'day': np.int32,
+    'status': np.int8,
+    'class_id': np.int32,
+    'subject_id': np.int32,
+    'period': np.int8,
+}
+
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+
+
+def cache_path():
+    return os.path.join(settings.ATTENDANCE_ANALYTICS_CACHE_DIR, 'attendance_records.npz')
+
+
+def invalidate():
+    """Drop the cached columns; called when existing records change."""
+    try:
+        os.remove(cache_path())
+    except FileNotFoundError:
+        pass
+
+
+def fetch_columns(queryset):
+    """Read ``queryset`` in chunks into one NumPy array per column."""
+    rows = queryset.annotate(
+        status_code=Case(
+            *[When(status=status, then=Value(code)) for status, code in STATUS_CODES.items()],
+            output_field=IntegerField(),
+        )
+    ).values_list(
+        'attendance__date', 'status_code', 'attendance__class_info_id',
+        'attendance__subject_id', 'attendance__period',
+    ).order_by().iterator(chunk_size=CHUNK_SIZE)
+
+    epoch = EPOCH.toordinal()
+    chunks = {column: [] for column in COLUMNS}
+    buffer = []
+    for row in rows:
+        buffer.append((row[0].toordinal() - epoch,) + row[1:])
+        if len(buffer) == CHUNK_SIZE:
+            append_chunk(chunks, buffer)
+            buffer = []
+    append_chunk(chunks, buffer)
+
+    return {
+        column: np.concatenate(parts) if parts else np.empty(0, dtype=DTYPES[column])
+        for column, parts in chunks.items()
+    }
+
+
+def append_chunk(chunks, buffer):
+    if not buffer:
+        return
+    for index, column in enumerate(zip(*buffer)):
+        chunks[COLUMNS[index]].append(np.array(column, dtype=DTYPES[COLUMNS[index]]))
+
+
+def load_columns():
+    """Return the record columns, reusing and extending the on-disk cache."""
+    state = AttendanceRecord.objects.aggregate(count=Count('id'), high_water=Max('created_at'))
+    if state['count'] == 0:
+        return fetch_columns(AttendanceRecord.objects.none())
+
+    columns = None
+    path = cache_path()
+    if os.path.exists(path):
+        with np.load(path) as cached:
+            high_water = parse_datetime(str(cached['high_water']))
+            cached_count = int(cached['count'])
+            columns = {column: cached[column] for column in COLUMNS}
+
+        if high_water != state['high_water'] or cached_count != state['count']:
+            # Only records created after the high-water mark are read again;
+            # if the counts still disagree something was deleted or missed.
+            new_columns = fetch_columns(AttendanceRecord.objects.filter(created_at__gt=high_water))
+            if cached_count + len(new_columns['day']) == state['count']:
+                columns = {
+                    column: np.concatenate([columns[column], new_columns[column]])
+                    for column in COLUMNS
+                }
+            else:
+                columns = None
+        else:
+            return columns
+
+    if columns is None:
+        columns = fetch_columns(AttendanceRecord.objects.all())
+
+    save_columns(columns, state)
+    return columns
+
+
+def save_columns(columns, state):
+    path = cache_path()
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    temp_path = f'{path}.{os.getpid()}.tmp'
+    with open(temp_path, 'wb') as handle:
+        np.savez(
+            handle,
+            high_water=np.array(state['high_water'].isoformat()),
+            count=np.array(state['count']),
+            **columns
+        )
+    os.replace(temp_path, path)
+
+
+def rolling_rate(present, total, window):
+    """Rate over the trailing ``window`` days, weighted by the number of records."""
+    present_sum = np.cumsum(present)
+    total_sum = np.cumsum(total)
+    present_sum[window:] = present_sum[window:] - present_sum[:-window]
+    total_sum[window:] = total_sum[window:] - total_sum[:-window]
+    return ratio(present_sum, total_sum)
+
+
+def ratio(present, total):
+    with np.errstate(divide='ignore', invalid='ignore'):
+        rate = np.round(present / total * 100, 2)
+    return [None if np.isnan(value) else float(value) for value in rate]
+
+
+def grouped_daily_rate(day_index, group_ids, is_present, n_days, labels):
+    """Daily present rate for every value of ``group_ids``."""
+    groups, group_index = np.unique(group_ids, return_inverse=True)
+    key = day_index * len(groups) + group_index
+    size = n_days * len(groups)
+    total = np.bincount(key, minlength=size).reshape(n_days, len(groups))
+    present = np.bincount(key, weights=is_present, minlength=size).reshape(n_days, len(groups))
+
+    return [
+        {
+            'id': int(group),
+            'label': labels.get(int(group), str(group)),
+            'rate': ratio(present[:, index], total[:, index]),
+            'overall': ratio(present[:, index].sum(keepdims=True), total[:, index].sum(keepdims=True))[0],
+        }
+        for index, group in enumerate(groups)
+    ]
+
+
+def attendance_trends(start, end):
+    """
+    Compute the attendance trends for ``start``..``end`` (inclusive).
+
+    The result is plain lists and dicts so it can be rendered or returned as
+    JSON directly. Rates are percentages of present records, matching
+    ``Attendance.attendance_percentage``; days without records are ``None``.
+    """
+    columns = load_columns()
+    first = (start - EPOCH).days
+    n_days = (end - start).days + 1
+    if not 1 <= n_days <= MAX_RANGE_DAYS:
+        raise ValueError(f'The range must cover 1 to {MAX_RANGE_DAYS} days, got {n_days}')
+
+    # The rolling windows need the 30 days before the range as well
+    lead = 30
+    mask = (columns['day'] >= first - lead) & (columns['day'] < first + n_days)
+    day_index = columns['day'][mask] - (first - lead)
+    is_present = (columns['status'][mask] == STATUS_CODES['present']).astype(np.float64)
+
+    total = np.bincount(day_index, minlength=n_days + lead).astype(np.float64)
+    present = np.bincount(day_index, weights=is_present, minlength=n_days + lead)
+
+    in_range = day_index >= lead
+    range_index = day_index[in_range] - lead
+    range_present = is_present[in_range]
+
+    weekday = (range_index + start.weekday()) % 7
+    weekday_total = np.bincount(weekday, minlength=7)
+    weekday_present = np.bincount(weekday, weights=range_present, minlength=7)
+
+    class_labels = {cls.id: str(cls) for cls in Class.objects.all()}
+    subject_labels = {subject.id: str(subject) for subject in Subject.objects.all()}
+    period_labels = dict(Attendance.PERIOD_CHOICES)
+
+    return {
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'days': [(start + timedelta(days=offset)).isoformat() for offset in range(n_days)],
+        'total_records': int(in_range.sum()),
+        'school': {
+            'rate': ratio(present[lead:], total[lead:]),
+            'rolling_7': rolling_rate(present, total, 7)[lead:],
+            'rolling_30': rolling_rate(present, total, 30)[lead:],
+        },
+        'by_class': grouped_daily_rate(
+            range_index, columns['class_id'][mask][in_range], range_present, n_days, class_labels
+        ),
+        'by_subject': grouped_daily_rate(
+            range_index, columns['subject_id'][mask][in_range], range_present, n_days, subject_labels
+        ),
+        'by_period': grouped_daily_rate(
+            range_index, columns['period'][mask][in_range], range_present, n_days, period_labels
+        ),
+        'weekday': [
+            {'weekday': name, 'records': int(weekday_total[index]), 'rate': rate}
+            for index, (name, rate) in enumerate(zip(WEEKDAYS, ratio(weekday_present, weekday_total)))
+        ],
+    }
@@ -0,0 +1,191 @@
+"""
+Archival of closed attendance years.
+
+``archive_year`` freezes a year's ``MonthlyReport`` totals and then moves its
+``Attendance`` and ``AttendanceRecord`` rows into ``ArchivedAttendanceRecord``
+(optionally a separate database, see ``attendance.routers``), so the hot
+tables only hold the years still being written. Readers that may span
+archived years go through ``archived_records`` or ``attendance_history``;
+when a range does not reach an archived year they never touch the archive.
+"""
+from datetime import date
+import heapq
+from operator import itemgetter
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F
+
+from . import analytics
+from .models import Attendance, AttendanceArchive, AttendanceRecord, ArchivedAttendanceRecord, MonthlyReport
+from .reports import rebuild_monthly_reports
+from .routers import archive_database
+from .signals import report_updates_suspended
+
+ARCHIVED_YEARS_CACHE_KEY = 'attendance_archived_years'
+
+# The archive command clears the key itself; the timeout bounds how long
+# other processes keep the old list when the cache is not shared
+ARCHIVED_YEARS_CACHE_TIMEOUT = 60
+
+# Periods moved per transaction; each carries one record per student
+ATTENDANCE_CHUNK_SIZE = 200
+
+CHUNK_SIZE = 5000
+
+BULK_BATCH_SIZE = 500
+
+HISTORY_FIELDS = ['date', 'period', 'class_id', 'subject_id', 'student_id', 'roll_number', 'status', 'remarks']
+
+HISTORY_ORDER = ['date', 'class_id', 'period', 'roll_number']
+
+
+def archived_years():
+    """Return the sorted list of archived years, cached for ``ARCHIVED_YEARS_CACHE_TIMEOUT`` seconds."""
+    years = cache.get(ARCHIVED_YEARS_CACHE_KEY)
+    if years is None:
+        years = sorted(AttendanceArchive.objects.values_list('year', flat=True))
+        cache.set(ARCHIVED_YEARS_CACHE_KEY, years, ARCHIVED_YEARS_CACHE_TIMEOUT)
+    return years
+
+
+def archived_records(start=None, end=None):
+    """
+    Archived records between ``start`` and ``end`` (inclusive, either open).
+
+    Returns an empty queryset, which runs no query, when no archived year
+    falls in the range.
+    """
+    years = [
+        year for year in archived_years()
+        if (start is None or year >= start.year) and (end is None or year <= end.year)
+    ]
+    if not years:
+        return ArchivedAttendanceRecord.objects.none()
+
+    records = ArchivedAttendanceRecord.objects.filter(year__in=years)
+    if start is not None:
+        records = records.filter(date__gte=start)
+    if end is not None:
+        records = records.filter(date__lte=end)
+    return records
+
+
+def attendance_history(start, end, class_id=None, student_id=None):
+    """
+    Iterate live and archived records between ``start`` and ``end`` as dicts.
+
+    Each row carries ``HISTORY_FIELDS`` and rows come ordered by date, class,
+    period and roll number. When the archive shares the default database the
+    two tables are read with one ``UNION ALL``; otherwise the two ordered
+    streams are merged in Python.
+    """
+    hot = AttendanceRecord.objects.filter(
+        attendance__date__gte=start,
+        attendance__date__lte=end,
+    )
+    archived = archived_records(start, end)
+    if class_id is not None:
+        hot = hot.filter(attendance__class_info_id=class_id)
+        archived = archived.filter(class_id=class_id)
+    if student_id is not None:
+        hot = hot.filter(student_id=student_id)
+        archived = archived.filter(student_id=student_id)
+
+    hot = hot.values(
+        'student_id', 'status', 'remarks',
+        date=F('attendance__date'),
+        period=F('attendance__period'),
+        class_id=F('attendance__class_info_id'),
+        subject_id=F('attendance__subject_id'),
+        roll_number=F('student__roll_number'),
+    )
+    if archived.query.is_empty():
+        return hot.order_by(*HISTORY_ORDER).iterator(chunk_size=CHUNK_SIZE)
+
+    archived = archived.values('student_id', 'status', 'remarks', 'date', 'period', 'class_id', 'subject_id', 'roll_number')
+    if archive_database() == 'default':
+        return hot.union(archived, all=True).order_by(*HISTORY_ORDER).iterator(chunk_size=CHUNK_SIZE)
+
+    return heapq.merge(
+        archived.order_by(*HISTORY_ORDER).iterator(chunk_size=CHUNK_SIZE),
+        hot.order_by(*HISTORY_ORDER).iterator(chunk_size=CHUNK_SIZE),
+        key=itemgetter(*HISTORY_ORDER),
+    )
+
+
+def archive_year(year, today=None):
+    """
+    Move every attendance period of ``year`` into the archive.
+
+    The year's monthly reports are rebuilt and frozen first, so totals stay
+    readable after the records leave the hot tables. Rows are copied and
+    deleted in chunks of ``ATTENDANCE_CHUNK_SIZE`` periods. Each chunk's
+    copies are committed before its live rows are deleted, in a second
+    transaction, so a crash between the two never loses rows even when the
+    archive is a separate database; copies are keyed on the original record
+    id, so an interrupted run can simply be repeated.
+    Returns ``(attendance_count, record_count)`` moved by this run.
+    """
+    today = today or date.today()
+    if year >= today.year:
+        raise ValueError(f'{year} is not a closed year')
+
+    start, end = date(year, 1, 1), date(year, 12, 31)
+    database = archive_database()
+
+    with transaction.atomic():
+        rebuild_monthly_reports(start, end)
+        MonthlyReport.objects.filter(year=year).update(is_frozen=True)
+
+    attendance_count = record_count = 0
+    periods = Attendance.objects.filter(date__gte=start, date__lte=end).order_by('id')
+    while True:
+        attendance_ids = list(periods.values_list('id', flat=True)[:ATTENDANCE_CHUNK_SIZE])
+        if not attendance_ids:
+            break
+
+        rows = AttendanceRecord.objects.filter(attendance_id__in=attendance_ids).values_list(
+            'id', 'attendance_id', 'attendance__date', 'attendance__period',
+            'attendance__class_info_id', 'attendance__subject_id', 'attendance__teacher_id',
+            'student_id', 'student__roll_number', 'status', 'remarks', 'created_at',
+        )
+        archived = [
+            ArchivedAttendanceRecord(
+                record_id=record_id,
+                attendance_id=attendance_id,
+                year=year,
+                date=day,
+                period=period,
+                class_id=class_id,
+                subject_id=subject_id,
+                teacher_id=teacher_id,
+                student_id=student_id,
+                roll_number=roll_number,
+                status=status,
+                remarks=remarks,
+                created_at=created_at,
+            )
+            for record_id, attendance_id, day, period, class_id, subject_id, teacher_id,
+                student_id, roll_number, status, remarks, created_at in rows
+        ]
+
+        with transaction.atomic(using=database):
+            ArchivedAttendanceRecord.objects.using(database).bulk_create(
+                archived, batch_size=BULK_BATCH_SIZE, ignore_conflicts=True,
+            )
+        with transaction.atomic(), report_updates_suspended():
+            Attendance.objects.filter(id__in=attendance_ids).delete()
+
+        attendance_count += len(attendance_ids)
+        record_count += len(archived)
+
+    archive, created = AttendanceArchive.objects.get_or_create(year=year, defaults={'database': database})
+    archive.database = database
+    archive.attendance_count += attendance_count
+    archive.record_count += record_count
+    archive.save()
+
+    cache.delete(ARCHIVED_YEARS_CACHE_KEY)
+    analytics.invalidate()
+    return attendance_count, record_count
@@ -0,0 +1,68 @@
+"""
+Attendance register exports.
+
+Rows are read with ``values(...).iterator()`` and written out one at a
+time, either as CSV chunks for ``StreamingHttpResponse`` or into an openpyxl
+write-only workbook, so memory use stays flat however long the range is.
+"""
+import csv
+
+from school_management.streaming import Echo
+
+from .archive import attendance_history
+from .models import Attendance, AttendanceRecord, Class, Student, Subject
+
+HEADER = ['তারিখ', 'শ্রেণী', 'শাখা', 'বিষয়', 'পিরিয়ড', 'রোল নং', 'শিক্ষার্থী আইডি', 'নাম', 'স্ট্যাটাস', 'মন্তব্য']
+
+
+def register_rows(start, end, class_info=None):
+    """
+    Yield one register row per attendance record between ``start`` and ``end``.
+
+    Records are read through ``attendance_history``, so archived years are
+    included; classes, subjects and students are resolved from lookups loaded
+    once up front.
+    """
+    class_names = dict(Class.CLASS_CHOICES)
+    subject_names = dict(Subject.SUBJECT_CHOICES)
+    periods = dict(Attendance.PERIOD_CHOICES)
+    statuses = dict(AttendanceRecord.STATUS_CHOICES)
+
+    classes = {
+        class_id: (class_names.get(class_name, class_name), section)
+        for class_id, class_name, section in Class.objects.values_list('id', 'class_name', 'section')
+    }
+    subjects = {
+        subject_id: subject_names.get(name, name)
+        for subject_id, name in Subject.objects.values_list('id', 'name')
+    }
+    students = {
+        pk: (student_id, name)
+        for pk, student_id, name in Student.objects.values_list('id', 'student_id', 'name')
+    }
+
+    rows = attendance_history(start, end, class_id=class_info.id if class_info else None)
+    for row in rows:
+        class_name, section = classes.get(row['class_id'], (row['class_id'], ''))
+        student_id, name = students.get(row['student_id'], (row['student_id'], ''))
+        yield [
+            row['date'].isoformat(),
+            class_name,
+            section,
+            subjects.get(row['subject_id'], row['subject_id']),
+            periods.get(row['period'], row['period']),
+            row['roll_number'],
+            student_id,
+            name,
+            statuses.get(row['status'], row['status']),
+            row['remarks'],
+        ]
+
+
+def csv_lines(rows):
+    writer = csv.writer(Echo())
+    # BOM so Excel opens the Bengali text as UTF-8
+    yield '\ufeff'
+    yield writer.writerow(HEADER)
+    for row in rows:
+        yield writer.writerow(row)
@@ -99,4 +99,47 @@ class BulkAttendanceForm(forms.Form):
         choices=[('present', 'সবাই উপস্থিত'), ('absent', 'সবাই অনুপস্থিত')],
         widget=forms.Select(attrs={'class': 'form-control'}),
         label='ডিফল্ট স্ট্যাটাস'
-    )
\ No newline at end of file
+    )
+
+class DateRangeForm(forms.Form):
+    start_date = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+        label='শুরুর তারিখ'
+    )
+    end_date = forms.DateField(
+        required=False,
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'}),
+        label='শেষ তারিখ'
+    )
+    
+    def clean(self):
+        cleaned_data = super().clean()
+        start_date = cleaned_data.get('start_date')
+        end_date = cleaned_data.get('end_date')
+        if start_date and end_date and start_date > end_date:
+            raise forms.ValidationError('শুরুর তারিখ শেষ তারিখের পরে হতে পারে না')
+        return cleaned_data
+
+class ClassAttendanceSummaryForm(DateRangeForm):
+    per_day = forms.BooleanField(
+        required=False,
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        label='দিনভিত্তিক কলাম'
+    )
+
+class AttendanceExportForm(DateRangeForm):
+    class_info = forms.ModelChoiceField(
+        queryset=Class.objects.all(),
+        required=False,
+        empty_label="সব শ্রেণী",
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label='শ্রেণী'
+    )
+    format = forms.ChoiceField(
+        choices=[('csv', 'CSV'), ('xlsx', 'Excel (XLSX)')],
+        initial='csv',
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-control'}),
+        label='ফরম্যাট'
+    )
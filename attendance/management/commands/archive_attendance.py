@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand, CommandError
+import time
+
+from attendance.archive import archive_year
+
+
+class Command(BaseCommand):
+    help = (
+        'Move the attendance of closed years into the archive table after freezing their monthly reports. '
+        'Set ATTENDANCE_ARCHIVE_DB to keep the archive in a separate SQLite file.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, nargs='+', dest='years', required=True, help='Years to archive')
+
+    def handle(self, *args, **kwargs):
+        for year in sorted(kwargs['years']):
+            started = time.perf_counter()
+            try:
+                attendance_count, record_count = archive_year(year)
+            except ValueError as e:
+                raise CommandError(str(e))
+            elapsed = time.perf_counter() - started
+
+            self.stdout.write(
+                self.style.SUCCESS(
+                    f'Archived {year}: {attendance_count} periods and {record_count} records in {elapsed:.2f}s'
+                )
+            )
@@ -0,0 +1,84 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from datetime import date
+import time
+
+from attendance.models import Attendance, AttendanceRecord, Student, Class, Subject
+from attendance.services import create_attendance_records
+
+
+class Command(BaseCommand):
+    help = 'Measure queries and time spent saving one attendance period (all changes are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--sizes', type=int, nargs='+', default=[10, 60, 200],
+            help='Class sizes to benchmark'
+        )
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write(f"{'students':>10} {'per-row queries':>16} {'bulk queries':>13} {'per-row ms':>11} {'bulk ms':>9}")
+
+        for size in kwargs['sizes']:
+            row_queries, row_ms = self.run_once(size, self.save_per_row)
+            bulk_queries, bulk_ms = self.run_once(size, self.save_bulk)
+            self.stdout.write(
+                f"{size:>10} {row_queries:>16} {bulk_queries:>13} {row_ms:>11.1f} {bulk_ms:>9.1f}"
+            )
+
+    def run_once(self, size, save):
+        with transaction.atomic():
+            attendance, student_ids = self.seed(size)
+
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                save(attendance, student_ids)
+                elapsed = (time.perf_counter() - started) * 1000
+
+            transaction.set_rollback(True)
+        return len(queries), elapsed
+
+    def seed(self, size):
+        teacher = get_user_model().objects.create(username='attendance-benchmark')
+        class_info, _ = Class.objects.get_or_create(class_name=10, section='C')
+        subject = Subject.objects.create(name='math', code='BENCH')
+
+        students = Student.objects.bulk_create([
+            Student(
+                student_id=f'BENCH-{number}',
+                roll_number=10000 + number,
+                name=f'Benchmark {number}',
+                gender='M',
+                date_of_birth=date(2010, 1, 1),
+                class_info=class_info,
+                address='-',
+                guardian_name='-',
+                guardian_phone='-',
+            )
+            for number in range(size)
+        ])
+
+        attendance = Attendance.objects.create(
+            class_info=class_info,
+            subject=subject,
+            date=date.today(),
+            period=1,
+            teacher=teacher,
+        )
+        return attendance, [student.id for student in students]
+
+    def save_per_row(self, attendance, student_ids):
+        for student_id in student_ids:
+            AttendanceRecord.objects.create(
+                attendance=attendance,
+                student_id=student_id,
+                status='present' if student_id % 5 else 'absent',
+            )
+
+    def save_bulk(self, attendance, student_ids):
+        create_attendance_records(attendance, [
+            (student_id, 'present' if student_id % 5 else 'absent', '')
+            for student_id in student_ids
+        ])
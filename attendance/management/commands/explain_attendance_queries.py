@@ -0,0 +1,150 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.db.models import Count
+from datetime import date, timedelta
+import math
+import time
+
+from attendance.models import Attendance, AttendanceRecord, Student, Class, Subject
+from attendance.periods import month_range, range_q
+
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        'Seed a large attendance dataset, then compare the query plans and timings of '
+        'extract-based (date__year/date__month) and range-based filters (all changes are rolled back)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=1000000, help='Number of attendance records to seed')
+        parser.add_argument('--students', type=int, default=60, help='Students per class')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per query; the fastest is reported')
+
+    def handle(self, *args, **kwargs):
+        with transaction.atomic():
+            started = time.perf_counter()
+            sample = self.seed(kwargs['rows'], kwargs['students'])
+            if connection.vendor == 'sqlite':
+                with connection.cursor() as cursor:
+                    cursor.execute('ANALYZE')
+            self.stdout.write(
+                f"Seeded {AttendanceRecord.objects.count()} attendance records in {time.perf_counter() - started:.1f}s\n"
+            )
+
+            for label, queryset in self.cases(**sample):
+                self.explain(label, queryset, kwargs['repeat'])
+
+            transaction.set_rollback(True)
+
+    def cases(self, student, class_info, attendance, year, month):
+        start, end = month_range(year, month)
+        return [
+            ('Student month, extract lookups', AttendanceRecord.objects.filter(
+                student=student, attendance__date__year=year, attendance__date__month=month,
+            )),
+            ('Student month, date range', AttendanceRecord.objects.filter(
+                range_q('attendance__date', start, end), student=student,
+            )),
+            ('Class month, extract lookups', Attendance.objects.filter(
+                class_info=class_info, date__year=year, date__month=month,
+            )),
+            ('Class month, date range', Attendance.objects.filter(
+                range_q('date', start, end), class_info=class_info,
+            )),
+            ('Class month records, extract lookups', AttendanceRecord.objects.filter(
+                attendance__class_info=class_info, attendance__date__year=year, attendance__date__month=month,
+            ).values('student_id', 'status').annotate(count=Count('id')).order_by()),
+            ('Class month records, date range', AttendanceRecord.objects.filter(
+                range_q('attendance__date', start, end), attendance__class_info=class_info,
+            ).values('student_id', 'status').annotate(count=Count('id')).order_by()),
+            ('Period status counts', AttendanceRecord.objects.filter(
+                attendance=attendance,
+            ).values('status').annotate(count=Count('id')).order_by()),
+        ]
+
+    def explain(self, label, queryset, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            count = len(queryset.all())
+            timings.append((time.perf_counter() - started) * 1000)
+
+        self.stdout.write(self.style.MIGRATE_HEADING(f'{label}: {count} rows in {min(timings):.1f} ms'))
+        for line in queryset.explain().splitlines():
+            self.stdout.write(f'    {line}')
+
+    def seed(self, rows, students_per_class):
+        teacher = get_user_model().objects.create(username='attendance-explain')
+        classes = [
+            Class.objects.get_or_create(class_name=class_name, section=section)[0]
+            for class_name, _ in Class.CLASS_CHOICES
+            for section in ('A', 'B', 'C')
+        ]
+        subjects = Subject.objects.bulk_create([
+            Subject(name=name, code=f'EXPL-{number}')
+            for number, (name, _) in enumerate(Subject.SUBJECT_CHOICES)
+        ])
+
+        students = Student.objects.bulk_create([
+            Student(
+                student_id=f'EXPL-{class_info.id}-{number}',
+                roll_number=10000 + number,
+                name=f'Explain {number}',
+                gender='M',
+                date_of_birth=date(2010, 1, 1),
+                class_info=class_info,
+                address='-',
+                guardian_name='-',
+                guardian_phone='-',
+            )
+            for class_info in classes
+            for number in range(students_per_class)
+        ], batch_size=BATCH_SIZE)
+        roster = {}
+        for student in students:
+            roster.setdefault(student.class_info_id, []).append(student.id)
+
+        periods = [period for period, _ in Attendance.PERIOD_CHOICES]
+        per_day = len(students) * len(periods)
+        days = math.ceil(rows / per_day)
+        first_day = date(2001, 1, 1)
+
+        created = 0
+        for offset in range(days):
+            day = first_day + timedelta(days=offset)
+            attendances = Attendance.objects.bulk_create([
+                Attendance(
+                    class_info=class_info,
+                    subject=subjects[(offset + period) % len(subjects)],
+                    date=day,
+                    period=period,
+                    teacher=teacher,
+                )
+                for class_info in classes
+                for period in periods
+            ], batch_size=BATCH_SIZE)
+
+            records = []
+            for attendance in attendances:
+                for student_id in roster[attendance.class_info_id]:
+                    if created + len(records) >= rows:
+                        break
+                    records.append(AttendanceRecord(
+                        attendance=attendance,
+                        student_id=student_id,
+                        status='absent' if (student_id + offset + attendance.period) % 9 == 0 else 'present',
+                    ))
+            AttendanceRecord.objects.bulk_create(records, batch_size=BATCH_SIZE)
+            created += len(records)
+
+        middle = first_day + timedelta(days=days // 2)
+        return {
+            'student': students[len(students) // 2],
+            'class_info': classes[0],
+            'attendance': attendances[0],
+            'year': middle.year,
+            'month': middle.month,
+        }
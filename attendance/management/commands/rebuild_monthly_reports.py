@@ -0,0 +1,34 @@
+from django.core.management.base import BaseCommand, CommandError
+from datetime import date, datetime
+
+from attendance.reports import rebuild_monthly_reports
+
+
+def parse_month(value):
+    try:
+        return datetime.strptime(value, '%Y-%m').date()
+    except ValueError:
+        raise CommandError(f'Invalid month "{value}", expected YYYY-MM')
+
+
+class Command(BaseCommand):
+    help = 'Recompute monthly attendance reports from the attendance records'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--from', dest='start', type=str, help='First month to rebuild (YYYY-MM), defaults to --to')
+        parser.add_argument('--to', dest='end', type=str, help='Last month to rebuild (YYYY-MM), defaults to the current month')
+        parser.add_argument('--student', type=int, nargs='+', dest='students', help='Only rebuild these student ids')
+
+    def handle(self, *args, **kwargs):
+        end = parse_month(kwargs['end']) if kwargs['end'] else date.today().replace(day=1)
+        start = parse_month(kwargs['start']) if kwargs['start'] else end
+        if start > end:
+            raise CommandError('--from must not be after --to')
+
+        written = rebuild_monthly_reports(start, end, student_ids=kwargs['students'])
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'Rebuilt {written} monthly reports for {start:%Y-%m} to {end:%Y-%m}'
+            )
+        )
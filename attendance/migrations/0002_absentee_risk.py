@@ -0,0 +1,41 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AbsenteeScanCheckpoint',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('last_record_id', models.BigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='AbsenteeRisk',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('current_streak', models.IntegerField(default=0, verbose_name='টানা অনুপস্থিতি')),
+                ('longest_streak', models.IntegerField(default=0, verbose_name='সর্বোচ্চ টানা অনুপস্থিতি')),
+                ('absence_rate', models.FloatField(default=0, verbose_name='অনুপস্থিতির হার')),
+                ('is_chronic', models.BooleanField(default=False, verbose_name='নিয়মিত অনুপস্থিত')),
+                ('last_record_date', models.DateField(blank=True, null=True, verbose_name='সর্বশেষ রেকর্ডের তারিখ')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='absentee_risk', to='attendance.student', verbose_name='শিক্ষার্থী')),
+            ],
+            options={
+                'verbose_name': 'অনুপস্থিতির ঝুঁকি',
+                'verbose_name_plural': 'অনুপস্থিতির ঝুঁকি তালিকা',
+                'indexes': [models.Index(fields=['is_chronic', '-current_streak', '-absence_rate'], name='absentee_risk_rank_idx')],
+            },
+        ),
+    ]
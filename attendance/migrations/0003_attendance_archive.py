@@ -0,0 +1,58 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('attendance', '0002_absentee_risk'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AttendanceArchive',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('year', models.IntegerField(unique=True, verbose_name='বছর')),
+                ('database', models.CharField(default='default', max_length=50, verbose_name='ডাটাবেস')),
+                ('attendance_count', models.IntegerField(default=0, verbose_name='উপস্থিতি সংখ্যা')),
+                ('record_count', models.IntegerField(default=0, verbose_name='রেকর্ড সংখ্যা')),
+                ('archived_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'আর্কাইভকৃত বছর',
+                'verbose_name_plural': 'আর্কাইভকৃত বছরসমূহ',
+                'ordering': ['-year'],
+            },
+        ),
+        migrations.AddField(
+            model_name='monthlyreport',
+            name='is_frozen',
+            field=models.BooleanField(default=False, verbose_name='স্থির'),
+        ),
+        migrations.CreateModel(
+            name='ArchivedAttendanceRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('record_id', models.BigIntegerField(unique=True)),
+                ('attendance_id', models.BigIntegerField()),
+                ('year', models.IntegerField(verbose_name='বছর')),
+                ('date', models.DateField(verbose_name='তারিখ')),
+                ('period', models.IntegerField(choices=[(1, '১ম পিরিয়ড'), (2, '২য় পিরিয়ড'), (3, '৩য় পিরিয়ড'), (4, '৪র্থ পিরিয়ড'), (5, '৫ম পিরিয়ড'), (6, '৬ষ্ঠ পিরিয়ড')], verbose_name='পিরিয়ড')),
+                ('class_id', models.IntegerField(verbose_name='শ্রেণী')),
+                ('subject_id', models.IntegerField(verbose_name='বিষয়')),
+                ('teacher_id', models.IntegerField(null=True, verbose_name='শিক্ষক')),
+                ('student_id', models.IntegerField(verbose_name='শিক্ষার্থী')),
+                ('roll_number', models.IntegerField(verbose_name='রোল নং')),
+                ('status', models.CharField(choices=[('present', 'উপস্থিত'), ('absent', 'অনুপস্থিত'), ('late', 'দেরীতে উপস্থিত'), ('excused', 'ছুটি প্রাপ্ত')], max_length=10, verbose_name='স্ট্যাটাস')),
+                ('remarks', models.CharField(blank=True, max_length=200, verbose_name='মন্তব্য')),
+                ('created_at', models.DateTimeField()),
+            ],
+            options={
+                'verbose_name': 'আর্কাইভকৃত উপস্থিতি রেকর্ড',
+                'verbose_name_plural': 'আর্কাইভকৃত উপস্থিতি রেকর্ডসমূহ',
+                'indexes': [models.Index(fields=['year', 'class_id', 'date'], name='archived_record_class_idx'), models.Index(fields=['student_id', 'date'], name='archived_record_student_idx')],
+            },
+        ),
+    ]
@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import Count, Q
 from django.conf import settings
 from django.core.validators import MinValueValidator, MaxValueValidator
 
@@ -73,6 +74,15 @@ class Student(models.Model):
     def __str__(self):
         return f"{self.name} - {self.class_info}"
 
+class AttendanceQuerySet(models.QuerySet):
+    def with_counts(self):
+        """Annotate the record counts read by the ``Attendance`` properties."""
+        return self.annotate(
+            annotated_total_students=Count('attendance_records'),
+            annotated_present_count=Count('attendance_records', filter=Q(attendance_records__status='present')),
+            annotated_absent_count=Count('attendance_records', filter=Q(attendance_records__status='absent')),
+        )
+
 class Attendance(models.Model):
     PERIOD_CHOICES = [
         (1, '১ম পিরিয়ড'),
@@ -91,30 +101,46 @@ class Attendance(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = AttendanceQuerySet.as_manager()
+    
     class Meta:
         verbose_name = "উপস্থিতি"
         verbose_name_plural = "উপস্থিতি রেকর্ড"
         unique_together = ['class_info', 'subject', 'date', 'period']
+        indexes = [
+            models.Index(fields=['class_info', 'date'], name='attendance_class_date_idx'),
+            # The attendance list pages by (date, created_at, id)
+            models.Index(fields=['date', 'created_at'], name='attendance_date_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.class_info} - {self.subject} - {self.date}"
     
+    # The counts below reuse the values from AttendanceQuerySet.with_counts()
+    # when present and only fall back to a COUNT query otherwise.
     @property
     def total_students(self):
+        if hasattr(self, 'annotated_total_students'):
+            return self.annotated_total_students
         return self.attendance_records.count()
     
     @property
     def present_count(self):
+        if hasattr(self, 'annotated_present_count'):
+            return self.annotated_present_count
         return self.attendance_records.filter(status='present').count()
     
     @property
     def absent_count(self):
+        if hasattr(self, 'annotated_absent_count'):
+            return self.annotated_absent_count
         return self.attendance_records.filter(status='absent').count()
     
     @property
     def attendance_percentage(self):
-        if self.total_students > 0:
-            return round((self.present_count / self.total_students) * 100, 2)
+        total_students = self.total_students
+        if total_students > 0:
+            return round((self.present_count / total_students) * 100, 2)
         return 0
 
 class AttendanceRecord(models.Model):
@@ -130,14 +156,31 @@ class AttendanceRecord(models.Model):
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='present', verbose_name="স্ট্যাটাস")
     remarks = models.CharField(max_length=200, blank=True, verbose_name="মন্তব্য")
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     
     class Meta:
         verbose_name = "উপস্থিতি রেকর্ড"
         verbose_name_plural = "উপস্থিতি রেকর্ডসমূহ"
         unique_together = ['attendance', 'student']
+        indexes = [
+            models.Index(fields=['student', 'attendance'], name='record_student_attendance_idx'),
+            models.Index(fields=['attendance', 'status'], name='record_attendance_status_idx'),
+            # Records changed since the last absentee scan
+            models.Index(fields=['updated_at'], name='record_updated_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.name} - {self.attendance.date} - {self.get_status_display()}"
+    
+    # The monthly report deltas are applied from signals; running save and
+    # delete in a transaction keeps the record and its report in step.
+    def save(self, *args, **kwargs):
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+    
+    def delete(self, *args, **kwargs):
+        with transaction.atomic():
+            return super().delete(*args, **kwargs)
 
 class MonthlyReport(models.Model):
     student = models.ForeignKey(Student, on_delete=models.CASCADE, verbose_name="শিক্ষার্থী")
@@ -148,6 +191,8 @@ class MonthlyReport(models.Model):
     absent_days = models.IntegerField(default=0, verbose_name="অনুপস্থিত দিন")
     late_days = models.IntegerField(default=0, verbose_name="দেরীতে উপস্থিত দিন")
     attendance_percentage = models.FloatField(default=0, verbose_name="উপস্থিতির হার")
+    # Set once the month's records are archived; incremental deltas skip frozen reports
+    is_frozen = models.BooleanField(default=False, verbose_name="স্থির")
     
     class Meta:
         verbose_name = "মাসিক রিপোর্ট"
@@ -157,7 +202,90 @@ class MonthlyReport(models.Model):
     def __str__(self):
         return f"{self.student.name} - {self.month}/{self.year}"
     
-    def save(self, *args, **kwargs):
+    def calculate_percentage(self):
         if self.total_days > 0:
             self.attendance_percentage = round((self.present_days / self.total_days) * 100, 2)
-        super().save(*args, **kwargs)
\ No newline at end of file
+        else:
+            self.attendance_percentage = 0
+    
+    def save(self, *args, **kwargs):
+        self.calculate_percentage()
+        super().save(*args, **kwargs)
+
+class AbsenteeRisk(models.Model):
+    student = models.OneToOneField(Student, on_delete=models.CASCADE, related_name='absentee_risk', verbose_name="শিক্ষার্থী")
+    current_streak = models.IntegerField(default=0, verbose_name="টানা অনুপস্থিতি")
+    longest_streak = models.IntegerField(default=0, verbose_name="সর্বোচ্চ টানা অনুপস্থিতি")
+    absence_rate = models.FloatField(default=0, verbose_name="অনুপস্থিতির হার")
+    is_chronic = models.BooleanField(default=False, verbose_name="নিয়মিত অনুপস্থিত")
+    last_record_date = models.DateField(null=True, blank=True, verbose_name="সর্বশেষ রেকর্ডের তারিখ")
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "অনুপস্থিতির ঝুঁকি"
+        verbose_name_plural = "অনুপস্থিতির ঝুঁকি তালিকা"
+        indexes = [
+            models.Index(fields=['is_chronic', '-current_streak', '-absence_rate'], name='absentee_risk_rank_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.current_streak} ({self.absence_rate}%)"
+
+
+class AbsenteeScanCheckpoint(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    last_record_id = models.BigIntegerField(default=0)
+    last_scanned_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    def __str__(self):
+        return f"{self.name} - {self.last_record_id}"
+
+
+class AttendanceArchive(models.Model):
+    year = models.IntegerField(unique=True, verbose_name="বছর")
+    database = models.CharField(max_length=50, default='default', verbose_name="ডাটাবেস")
+    attendance_count = models.IntegerField(default=0, verbose_name="উপস্থিতি সংখ্যা")
+    record_count = models.IntegerField(default=0, verbose_name="রেকর্ড সংখ্যা")
+    archived_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = "আর্কাইভকৃত বছর"
+        verbose_name_plural = "আর্কাইভকৃত বছরসমূহ"
+        ordering = ['-year']
+    
+    def __str__(self):
+        return f"{self.year} - {self.record_count}"
+
+
+class ArchivedAttendanceRecord(models.Model):
+    """
+    One attendance record of a closed year, flattened together with its period.
+
+    Related rows are kept as plain ids rather than foreign keys so the table
+    can live in a separate database (see ``attendance.routers``).
+    """
+    record_id = models.BigIntegerField(unique=True)
+    attendance_id = models.BigIntegerField()
+    year = models.IntegerField(verbose_name="বছর")
+    date = models.DateField(verbose_name="তারিখ")
+    period = models.IntegerField(choices=Attendance.PERIOD_CHOICES, verbose_name="পিরিয়ড")
+    class_id = models.IntegerField(verbose_name="শ্রেণী")
+    subject_id = models.IntegerField(verbose_name="বিষয়")
+    teacher_id = models.IntegerField(null=True, verbose_name="শিক্ষক")
+    student_id = models.IntegerField(verbose_name="শিক্ষার্থী")
+    roll_number = models.IntegerField(verbose_name="রোল নং")
+    status = models.CharField(max_length=10, choices=AttendanceRecord.STATUS_CHOICES, verbose_name="স্ট্যাটাস")
+    remarks = models.CharField(max_length=200, blank=True, verbose_name="মন্তব্য")
+    created_at = models.DateTimeField()
+    
+    class Meta:
+        verbose_name = "আর্কাইভকৃত উপস্থিতি রেকর্ড"
+        verbose_name_plural = "আর্কাইভকৃত উপস্থিতি রেকর্ডসমূহ"
+        indexes = [
+            models.Index(fields=['year', 'class_id', 'date'], name='archived_record_class_idx'),
+            models.Index(fields=['student_id', 'date'], name='archived_record_student_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student_id} - {self.date} - {self.get_status_display()}"
@@ -0,0 +1,57 @@
+"""
+Month and year filters expressed as date ranges.
+
+``date__month=``/``date__year=`` lookups compile to a function call on the
+column (``django_date_extract`` on SQLite), which no index can serve. The
+helpers here turn a year and/or month into half-open ``[start, end)`` ranges
+so the same filters become plain ``date >= start AND date < end`` comparisons.
+"""
+from datetime import date
+from functools import reduce
+import operator
+
+from django.db.models import Q
+
+
+def month_range(year, month):
+    """Return ``(first day of the month, first day of the next month)``."""
+    start = date(year, month, 1)
+    if month == 12:
+        return start, date(year + 1, 1, 1)
+    return start, date(year, month + 1, 1)
+
+
+def year_range(year):
+    """Return ``(1 January, 1 January of the next year)``."""
+    return date(year, 1, 1), date(year + 1, 1, 1)
+
+
+def months_between(start, end):
+    """Return ``(month start, next month start)`` of the months ``start``..``end`` touch."""
+    first, _ = month_range(start.year, start.month)
+    _, after_last = month_range(end.year, end.month)
+    return first, after_last
+
+
+def range_q(field, start, end):
+    """``Q`` matching ``start <= field < end``."""
+    return Q(**{f'{field}__gte': start, f'{field}__lt': end})
+
+
+def period_q(field, year=None, month=None, years=None):
+    """
+    ``Q`` for a year and/or month filter on the date ``field``.
+
+    With only a month, the month is matched in each of ``years`` (e.g. the
+    years a student has records in), since a bare month is not a range.
+    Returns an empty ``Q`` when neither year nor month is given.
+    """
+    if year and month:
+        return range_q(field, *month_range(year, month))
+    if year:
+        return range_q(field, *year_range(year))
+    if month:
+        return reduce(operator.or_, [
+            range_q(field, *month_range(year, month)) for year in sorted(set(years or []))
+        ], Q(pk__in=[]))
+    return Q()
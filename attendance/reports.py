@@ -0,0 +1,211 @@
+"""
+Incremental maintenance of ``MonthlyReport``.
+
+Every write to an ``AttendanceRecord`` is turned into a small delta (+1/-1
+for the total and for the status bucket) and applied to the matching report
+with ``F()`` expressions, so keeping reports current costs O(1) queries per
+write instead of a recount. ``rebuild_monthly_reports`` recomputes whole
+months from the records in one grouped query and is used to repair drift.
+
+The same deltas also expire the students' cached attendance summaries (see
+``attendance.summaries``), which count the same records: each student has a
+version number in the cache that is bumped once the write commits.
+"""
+from collections import defaultdict
+import time
+
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import Case, Count, F, FloatField, Q, Value, When
+from django.db.models.functions import Cast, ExtractMonth, ExtractYear, Round
+
+from .models import AttendanceRecord, MonthlyReport
+from .periods import months_between, range_q
+
+# Status -> MonthlyReport counter; 'excused' only counts towards total_days
+STATUS_FIELDS = {
+    'present': 'present_days',
+    'absent': 'absent_days',
+    'late': 'late_days',
+}
+
+COUNTER_FIELDS = ['total_days', 'present_days', 'absent_days', 'late_days']
+
+BULK_BATCH_SIZE = 500
+
+SUMMARY_VERSION_CACHE_KEY = 'attendance_summary_version:{}'
+
+
+def status_delta(status, sign=1):
+    """Return the counter changes caused by adding (or removing) one record."""
+    delta = {'total_days': sign}
+    if status in STATUS_FIELDS:
+        delta[STATUS_FIELDS[status]] = sign
+    return delta
+
+
+def add_delta(deltas, student_id, day, delta):
+    """Accumulate ``delta`` into ``deltas`` under the student-month of ``day``."""
+    counters = deltas[(student_id, day.year, day.month)]
+    for field, value in delta.items():
+        counters[field] += value
+
+
+def new_deltas():
+    return defaultdict(lambda: defaultdict(int))
+
+
+def summary_version(student_id):
+    """Version of one student's records, bumped whenever their counts change."""
+    key = SUMMARY_VERSION_CACHE_KEY.format(student_id)
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a version evicted from the cache is never reused
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def expire_summaries(student_ids):
+    """Bump the summary versions of ``student_ids`` once the current transaction commits."""
+    student_ids = set(student_ids)
+    if student_ids:
+        transaction.on_commit(lambda: cache.set_many(
+            {SUMMARY_VERSION_CACHE_KEY.format(student_id): time.time_ns() for student_id in student_ids},
+            None,
+        ))
+
+
+def apply_deltas(deltas):
+    """
+    Apply ``{(student_id, year, month): {field: change}}`` to the reports.
+
+    Missing reports are created first, then one UPDATE is issued per distinct
+    (month, change) combination, so a whole period costs a handful of queries.
+    Frozen reports (archived months) are left untouched. The students'
+    summaries are expired in any case.
+    """
+    deltas = {
+        key: {field: value for field, value in counters.items() if value}
+        for key, counters in deltas.items()
+    }
+    deltas = {key: counters for key, counters in deltas.items() if counters}
+    if not deltas:
+        return
+    expire_summaries(student_id for student_id, year, month in deltas)
+
+    by_month = defaultdict(list)
+    for student_id, year, month in deltas:
+        by_month[(year, month)].append(student_id)
+
+    with transaction.atomic():
+        for (year, month), student_ids in by_month.items():
+            existing = set(MonthlyReport.objects.filter(
+                student_id__in=student_ids, year=year, month=month
+            ).values_list('student_id', flat=True))
+            MonthlyReport.objects.bulk_create(
+                [
+                    MonthlyReport(student_id=student_id, year=year, month=month)
+                    for student_id in student_ids if student_id not in existing
+                ],
+                batch_size=BULK_BATCH_SIZE,
+                ignore_conflicts=True,
+            )
+
+        groups = defaultdict(list)
+        for (student_id, year, month), counters in deltas.items():
+            groups[(year, month, tuple(sorted(counters.items())))].append(student_id)
+
+        for (year, month, changes), student_ids in groups.items():
+            MonthlyReport.objects.filter(
+                student_id__in=student_ids, year=year, month=month, is_frozen=False
+            ).update(**counter_updates(dict(changes)))
+
+
+def counter_updates(changes):
+    """
+    Build the ``update()`` kwargs for one set of counter changes.
+
+    The right-hand side of an UPDATE sees the old row, so the percentage is
+    computed from the already-adjusted counters.
+    """
+    updates = {
+        field: F(field) + changes[field]
+        for field in COUNTER_FIELDS if changes.get(field)
+    }
+    total = F('total_days') + changes.get('total_days', 0)
+    present = F('present_days') + changes.get('present_days', 0)
+    updates['attendance_percentage'] = Case(
+        When(
+            total_days__gt=-changes.get('total_days', 0),
+            then=Round(Cast(present, FloatField()) * 100 / total, 2),
+        ),
+        default=Value(0.0),
+        output_field=FloatField(),
+    )
+    return updates
+
+
+def rebuild_monthly_reports(start, end, student_ids=None):
+    """
+    Recompute every report for the months between ``start`` and ``end``.
+
+    ``start`` and ``end`` are dates; every month they touch is rebuilt from a
+    single GROUP BY over the records. Reports in range with no records left
+    are reset to zero; frozen reports are skipped, since their records have
+    been archived. Returns the number of reports written.
+    """
+    first_day, after_last = months_between(start, end)
+
+    records = AttendanceRecord.objects.filter(range_q('attendance__date', first_day, after_last))
+    reports = MonthlyReport.objects.filter(
+        Q(year__gt=first_day.year) | Q(year=first_day.year, month__gte=first_day.month),
+        Q(year__lt=end.year) | Q(year=end.year, month__lte=end.month),
+    )
+    if student_ids is not None:
+        records = records.filter(student_id__in=student_ids)
+        reports = reports.filter(student_id__in=student_ids)
+
+    counts = records.annotate(
+        year=ExtractYear('attendance__date'),
+        month=ExtractMonth('attendance__date'),
+    ).values('student_id', 'year', 'month').annotate(
+        total=Count('id'),
+        present=Count('id', filter=Q(status='present')),
+        absent=Count('id', filter=Q(status='absent')),
+        late=Count('id', filter=Q(status='late')),
+    ).order_by()
+    counts = {(row['student_id'], row['year'], row['month']): row for row in counts}
+
+    existing = {
+        (report.student_id, report.year, report.month): report
+        for report in reports
+    }
+
+    frozen = {key for key, report in existing.items() if report.is_frozen}
+    existing = {key: report for key, report in existing.items() if not report.is_frozen}
+
+    to_update = list(existing.values())
+    to_create = []
+    for key in counts.keys() - existing.keys() - frozen:
+        student_id, year, month = key
+        report = MonthlyReport(student_id=student_id, year=year, month=month)
+        existing[key] = report
+        to_create.append(report)
+
+    for key, report in existing.items():
+        row = counts.get(key, {})
+        report.total_days = row.get('total', 0)
+        report.present_days = row.get('present', 0)
+        report.absent_days = row.get('absent', 0)
+        report.late_days = row.get('late', 0)
+        report.calculate_percentage()
+
+    with transaction.atomic():
+        MonthlyReport.objects.bulk_create(to_create, batch_size=BULK_BATCH_SIZE)
+        MonthlyReport.objects.bulk_update(
+            to_update,
+            COUNTER_FIELDS + ['attendance_percentage'],
+            batch_size=BULK_BATCH_SIZE,
+        )
+    return len(existing)
@@ -0,0 +1,37 @@
+"""
+Database router for archived attendance.
+
+``ArchivedAttendanceRecord`` is stored in the database named by the
+``ATTENDANCE_ARCHIVE_DATABASE`` setting (``default`` unless configured), so
+closed years can be moved into a separate SQLite file. Every other model is
+left to the default routing.
+"""
+from django.conf import settings
+
+ARCHIVE_MODEL = 'archivedattendancerecord'
+
+
+def archive_database():
+    return getattr(settings, 'ATTENDANCE_ARCHIVE_DATABASE', 'default')
+
+
+class AttendanceArchiveRouter:
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label == 'attendance' and model._meta.model_name == ARCHIVE_MODEL:
+            return archive_database()
+        return None
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        archive_db = archive_database()
+        if archive_db == 'default':
+            return None
+        if app_label == 'attendance' and model_name == ARCHIVE_MODEL:
+            return db == archive_db
+        if db == archive_db:
+            return False
+        return None
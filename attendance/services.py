@@ -0,0 +1,290 @@
+"""
+Set-based write paths for attendance.
+
+Saving a period through the ORM one row at a time costs a handful of queries
+per student (the INSERT or UPDATE plus the monthly report signal). The
+helpers here write a whole period with ``bulk_create``, or only its changed
+rows with ``bulk_update``, and apply the matching ``MonthlyReport`` deltas in
+one pass, so the number of queries stays the same whether a class has 10
+students or 200.
+"""
+from datetime import date
+from functools import reduce
+import operator
+
+from django.db import DatabaseError, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import analytics
+from .models import Attendance, AttendanceRecord, Class, Student, Subject
+from .reports import add_delta, apply_deltas, new_deltas, status_delta
+
+VALID_STATUSES = [choice[0] for choice in AttendanceRecord.STATUS_CHOICES]
+
+VALID_PERIODS = [choice[0] for choice in Attendance.PERIOD_CHOICES]
+
+BULK_BATCH_SIZE = 500
+
+
+def create_attendance_records(attendance, entries):
+    """
+    Create the records of one period and update the monthly reports.
+
+    ``entries`` is an iterable of ``(student_id, status, remarks)`` tuples.
+    Unknown statuses fall back to ``present``, the same default the form uses.
+    """
+    records = []
+    deltas = new_deltas()
+    for student_id, status, remarks in entries:
+        if status not in VALID_STATUSES:
+            status = 'present'
+        records.append(AttendanceRecord(
+            attendance=attendance,
+            student_id=student_id,
+            status=status,
+            remarks=remarks or '',
+        ))
+        add_delta(deltas, student_id, attendance.date, status_delta(status))
+
+    with transaction.atomic():
+        AttendanceRecord.objects.bulk_create(records, batch_size=BULK_BATCH_SIZE)
+        apply_deltas(deltas)
+    return records
+
+
+def update_attendance_records(records, changes):
+    """
+    Write only the records whose status or remarks actually changed.
+
+    ``records`` are the loaded records of one period and ``changes`` maps a
+    student id to its submitted ``(status, remarks)``. Entries with an
+    unknown status are ignored. The changed rows go out in one
+    ``bulk_update`` together with the matching report deltas; returns the
+    number of rows changed.
+    """
+    changed = []
+    status_changed = False
+    deltas = new_deltas()
+    now = timezone.now()
+    for record in records:
+        if record.student_id not in changes:
+            continue
+        status, remarks = changes[record.student_id]
+        remarks = remarks or ''
+        if status not in VALID_STATUSES:
+            continue
+        if status == record.status and remarks == record.remarks:
+            continue
+
+        if status != record.status:
+            day = record.attendance.date
+            add_delta(deltas, record.student_id, day, status_delta(record.status, -1))
+            add_delta(deltas, record.student_id, day, status_delta(status))
+            status_changed = True
+        record.status = status
+        record.remarks = remarks
+        # bulk_update does not apply auto_now; the absentee scan relies on it
+        record.updated_at = now
+        changed.append(record)
+
+    if not changed:
+        return 0
+
+    with transaction.atomic():
+        AttendanceRecord.objects.bulk_update(changed, ['status', 'remarks', 'updated_at'], batch_size=BULK_BATCH_SIZE)
+        apply_deltas(deltas)
+        if status_changed:
+            transaction.on_commit(analytics.invalidate)
+
+    for record in changed:
+        record._original_status = record.status
+    return len(changed)
+
+
+def sync_attendance(items, teacher):
+    """
+    Upsert many periods of attendance in one transaction.
+
+    Each item is ``{"class_info", "subject", "date", "period", "records":
+    [{"student", "status", "remarks"}]}``; the (class, subject, date, period)
+    key is the idempotency key, so sending an item twice updates the period
+    instead of duplicating it. Rosters, existing periods and their records
+    are loaded once for the whole batch. Every item runs in its own
+    savepoint, so one bad item does not undo the others. Returns one result
+    dict per item, in order.
+    """
+    parsed = [parse_sync_item(item) for item in items]
+    valid = [item for item in parsed if not item['errors']]
+
+    class_ids = {item['key'][0] for item in valid}
+    subject_ids = {item['key'][1] for item in valid}
+    known_classes = set(Class.objects.filter(id__in=class_ids).values_list('id', flat=True))
+    known_subjects = set(Subject.objects.filter(id__in=subject_ids).values_list('id', flat=True))
+
+    rosters = {class_id: [] for class_id in known_classes}
+    for student_id, class_id in Student.objects.filter(
+        class_info_id__in=known_classes, is_active=True
+    ).order_by('roll_number').values_list('id', 'class_info_id'):
+        rosters[class_id].append(student_id)
+
+    existing = {}
+    if valid:
+        key_filter = reduce(operator.or_, [
+            Q(class_info_id=class_id, subject_id=subject_id, date=day, period=period)
+            for class_id, subject_id, day, period in {item['key'] for item in valid}
+        ])
+        for attendance in Attendance.objects.filter(key_filter):
+            existing[(attendance.class_info_id, attendance.subject_id, attendance.date, attendance.period)] = attendance
+
+    existing_records = {attendance.id: [] for attendance in existing.values()}
+    for record in AttendanceRecord.objects.filter(attendance__in=list(existing.values())):
+        existing_records[record.attendance_id].append(record)
+
+    results = []
+    with transaction.atomic():
+        for item in parsed:
+            if not item['errors']:
+                class_id, subject_id = item['key'][:2]
+                if class_id not in known_classes:
+                    item['errors'].append(f'Unknown class {class_id}')
+                if subject_id not in known_subjects:
+                    item['errors'].append(f'Unknown subject {subject_id}')
+            if item['errors']:
+                results.append(sync_result(item, 'error'))
+                continue
+
+            try:
+                with transaction.atomic():
+                    results.append(sync_item(item, teacher, rosters, existing, existing_records))
+            except DatabaseError as e:
+                item['errors'].append(str(e))
+                results.append(sync_result(item, 'error'))
+                reload_period(item['key'], existing, existing_records)
+    return results
+
+
+def reload_period(key, existing, existing_records):
+    """
+    Reread one period and its records after its item's savepoint rolled back.
+
+    The item may have created the period or changed records in memory
+    before failing; later items must start from what is actually stored.
+    """
+    class_id, subject_id, day, period = key
+    attendance = existing.pop(key, None)
+    if attendance is not None:
+        existing_records.pop(attendance.id, None)
+
+    attendance = Attendance.objects.filter(
+        class_info_id=class_id, subject_id=subject_id, date=day, period=period,
+    ).first()
+    if attendance is not None:
+        existing[key] = attendance
+        existing_records[attendance.id] = list(AttendanceRecord.objects.filter(attendance=attendance))
+
+
+def parse_sync_item(item):
+    parsed = {'key': None, 'records': {}, 'errors': [], 'item': item}
+    if not isinstance(item, dict):
+        parsed['errors'].append('Item must be an object')
+        return parsed
+
+    try:
+        parsed['key'] = (
+            int(item['class_info']),
+            int(item['subject']),
+            date.fromisoformat(str(item['date'])),
+            int(item['period']),
+        )
+    except KeyError as e:
+        parsed['errors'].append(f'Missing field {e.args[0]}')
+        return parsed
+    except (TypeError, ValueError):
+        parsed['errors'].append('Invalid class_info, subject, date or period')
+        return parsed
+
+    if parsed['key'][3] not in VALID_PERIODS:
+        parsed['errors'].append(f'Invalid period {parsed["key"][3]}')
+
+    records = item.get('records')
+    if not isinstance(records, list):
+        parsed['errors'].append('records must be a list')
+        return parsed
+
+    for record in records:
+        try:
+            student_id = int(record['student'])
+        except (KeyError, TypeError, ValueError):
+            parsed['errors'].append('Every record needs a numeric student')
+            continue
+        status = record.get('status', 'present')
+        if status not in VALID_STATUSES:
+            parsed['errors'].append(f'Invalid status "{status}" for student {student_id}')
+            continue
+        parsed['records'][student_id] = (status, record.get('remarks') or '')
+    return parsed
+
+
+def sync_item(item, teacher, rosters, existing, existing_records):
+    class_id, subject_id, day, period = item['key']
+    roster = rosters[class_id]
+    unknown = set(item['records']) - set(roster)
+    if unknown:
+        item['errors'].append(
+            f'Students not active in class {class_id}: {", ".join(map(str, sorted(unknown)))}'
+        )
+        return sync_result(item, 'error')
+
+    attendance = existing.get(item['key'])
+    if attendance is None:
+        attendance = Attendance.objects.create(
+            class_info_id=class_id,
+            subject_id=subject_id,
+            date=day,
+            period=period,
+            teacher=teacher,
+        )
+        # Students missing from the batch default to present, as in the form
+        records = create_attendance_records(attendance, [
+            (student_id,) + item['records'].get(student_id, ('present', ''))
+            for student_id in roster
+        ])
+        # A later item with the same key updates these rows instead of inserting them again
+        existing[item['key']] = attendance
+        existing_records[attendance.id] = records
+        return sync_result(item, 'created', attendance, changed=len(roster))
+
+    records = existing_records[attendance.id]
+    for record in records:
+        record.attendance = attendance
+    changed = update_attendance_records(records, item['records'])
+
+    recorded = {record.student_id for record in records}
+    missing = [
+        (student_id,) + changes
+        for student_id, changes in item['records'].items() if student_id not in recorded
+    ]
+    if missing:
+        records.extend(create_attendance_records(attendance, missing))
+        changed += len(missing)
+    return sync_result(item, 'updated' if changed else 'unchanged', attendance, changed=changed)
+
+
+def sync_result(item, status, attendance=None, changed=0):
+    key = item['key']
+    result = {
+        'status': status,
+        'key': {
+            'class_info': key[0],
+            'subject': key[1],
+            'date': key[2].isoformat(),
+            'period': key[3],
+        } if key else None,
+        'changed': changed,
+    }
+    if attendance is not None:
+        result['attendance_id'] = attendance.id
+    if item['errors']:
+        result['errors'] = item['errors']
+    return result
@@ -1,56 +1,103 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save, pre_delete, post_delete
+from django.db import transaction
 from django.dispatch import receiver
-from django.db.models import Count
-from .models import AttendanceRecord, MonthlyReport
-from datetime import datetime
+from contextlib import contextmanager
+import threading
+from . import analytics
+from .models import Attendance, AttendanceRecord, Student
+from .reports import add_delta, apply_deltas, expire_summaries, new_deltas, rebuild_monthly_reports, status_delta
+
+_state = threading.local()
+
+@contextmanager
+def report_updates_suspended():
+    """Skip all report upkeep while the records and periods of frozen months are removed in bulk."""
+    _state.suspended = True
+    try:
+        yield
+    finally:
+        _state.suspended = False
+
+def deleting_students():
+    if not hasattr(_state, 'students'):
+        _state.students = set()
+    return _state.students
+
+def deleting_periods():
+    # attendance id -> (date, student ids), plus the months to rebuild once they are all gone
+    if not hasattr(_state, 'periods'):
+        _state.periods = {}
+        _state.rebuild = []
+    return _state.periods
+
+@receiver(post_init, sender=AttendanceRecord)
+def remember_original_status(sender, instance, **kwargs):
+    # The status as stored in the database, used to undo it on change/delete.
+    # Read from __dict__ so a deferred status does not trigger a query.
+    instance._original_status = instance.__dict__.get('status') if instance.pk else None
 
 @receiver(post_save, sender=AttendanceRecord)
 def update_monthly_report(sender, instance, created, **kwargs):
-    if created:
-        attendance = instance.attendance
-        student = instance.student
-        month = attendance.date.month
-        year = attendance.date.year
-        
-        # Get or create monthly report
-        monthly_report, created = MonthlyReport.objects.get_or_create(
-            student=student,
-            month=month,
-            year=year,
-            defaults={
-                'total_days': 0,
-                'present_days': 0,
-                'absent_days': 0,
-                'late_days': 0,
-            }
-        )
-        
-        # Update counts
-        monthly_report.total_days = AttendanceRecord.objects.filter(
-            student=student,
-            attendance__date__month=month,
-            attendance__date__year=year
-        ).count()
-        
-        monthly_report.present_days = AttendanceRecord.objects.filter(
-            student=student,
-            attendance__date__month=month,
-            attendance__date__year=year,
-            status='present'
-        ).count()
-        
-        monthly_report.absent_days = AttendanceRecord.objects.filter(
-            student=student,
-            attendance__date__month=month,
-            attendance__date__year=year,
-            status='absent'
-        ).count()
-        
-        monthly_report.late_days = AttendanceRecord.objects.filter(
-            student=student,
-            attendance__date__month=month,
-            attendance__date__year=year,
-            status='late'
-        ).count()
-        
-        monthly_report.save()
\ No newline at end of file
+    original_status = instance._original_status
+    instance._original_status = instance.status
+
+    if not created and (original_status is None or original_status == instance.status):
+        return
+
+    deltas = new_deltas()
+    day = instance.attendance.date
+    if not created:
+        add_delta(deltas, instance.student_id, day, status_delta(original_status, -1))
+        transaction.on_commit(analytics.invalidate)
+    add_delta(deltas, instance.student_id, day, status_delta(instance.status))
+    apply_deltas(deltas)
+
+@receiver(post_delete, sender=AttendanceRecord)
+def remove_from_monthly_report(sender, instance, **kwargs):
+    if instance._original_status is None or getattr(_state, 'suspended', False):
+        return
+    # Cascaded from a student or a period: handled once for the whole delete below
+    if instance.student_id in deleting_students() or instance.attendance_id in deleting_periods():
+        return
+
+    deltas = new_deltas()
+    add_delta(deltas, instance.student_id, instance.attendance.date, status_delta(instance._original_status, -1))
+    apply_deltas(deltas)
+    transaction.on_commit(analytics.invalidate)
+
+@receiver(pre_delete, sender=Student)
+def hold_student_reports(sender, instance, **kwargs):
+    # The student's reports are deleted with them, so their records are not subtracted
+    deleting_students().add(instance.pk)
+
+@receiver(post_delete, sender=Student)
+def release_student_reports(sender, instance, **kwargs):
+    deleting_students().discard(instance.pk)
+    expire_summaries([instance.pk])
+    transaction.on_commit(analytics.invalidate)
+
+@receiver(pre_delete, sender=Attendance)
+def hold_period_reports(sender, instance, **kwargs):
+    if getattr(_state, 'suspended', False):
+        # rebuild_period_reports then finds nothing to do either
+        return
+    student_ids = set(instance.attendance_records.values_list('student_id', flat=True))
+    deleting_periods()[instance.pk] = (instance.date, student_ids)
+
+@receiver(post_delete, sender=Attendance)
+def rebuild_period_reports(sender, instance, **kwargs):
+    periods = deleting_periods()
+    if instance.pk not in periods:
+        return
+    _state.rebuild.append(periods.pop(instance.pk))
+    if periods:
+        return
+
+    # The last period of this delete is gone: rebuild the months it touched once
+    dates = [day for day, student_ids in _state.rebuild]
+    student_ids = set().union(*(student_ids for day, student_ids in _state.rebuild)) - deleting_students()
+    _state.rebuild = []
+    if student_ids:
+        rebuild_monthly_reports(min(dates), max(dates), student_ids)
+        expire_summaries(student_ids)
+    transaction.on_commit(analytics.invalidate)
@@ -0,0 +1,165 @@
+"""
+Read-side aggregations over attendance records.
+
+Each helper answers a whole page from one grouped query instead of counting
+per student, so the cost does not grow with the size of the class. Archived
+years are added from a second grouped query only when the range reaches them.
+"""
+from collections import defaultdict
+from datetime import timedelta
+from itertools import chain
+
+from django.core.cache import cache
+from django.db.models import Count, Q
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from .archive import archived_records
+from .models import AttendanceRecord, Student, Subject
+from .reports import summary_version
+
+STATUSES = [choice[0] for choice in AttendanceRecord.STATUS_CHOICES]
+
+SUMMARY_CACHE_TIMEOUT = 300
+
+
+def class_attendance_matrix(class_info, start, end, per_day=False):
+    """
+    Build the class x student x status matrix for ``start``..``end`` (inclusive).
+
+    Returns ``(rows, days)``. Each row holds the student, the count per status,
+    the totals the summary page shows and, with ``per_day``, one cell per date
+    in ``days`` like a register sheet. ``days`` is empty unless ``per_day``.
+    """
+    students = Student.objects.filter(
+        class_info=class_info, is_active=True
+    ).order_by('roll_number')
+
+    group_by = ['student_id', 'status']
+    if per_day:
+        group_by.append('attendance__date')
+
+    counts = AttendanceRecord.objects.filter(
+        attendance__class_info=class_info,
+        attendance__date__gte=start,
+        attendance__date__lte=end,
+    ).values(*group_by).annotate(count=Count('id')).order_by()
+    archived_counts = archived_records(start, end).filter(
+        class_id=class_info.id
+    ).values('student_id', 'status', *(['date'] if per_day else [])).annotate(count=Count('id')).order_by()
+
+    status_counts = defaultdict(lambda: defaultdict(int))
+    day_counts = defaultdict(lambda: defaultdict(lambda: defaultdict(int)))
+    for row in chain(counts, archived_counts):
+        status_counts[row['student_id']][row['status']] += row['count']
+        if per_day:
+            day = row.get('attendance__date', row.get('date'))
+            day_counts[row['student_id']][day][row['status']] += row['count']
+
+    days = []
+    if per_day:
+        day = start
+        while day <= end:
+            days.append(day)
+            day += timedelta(days=1)
+
+    rows = []
+    for student in students:
+        statuses = status_counts[student.id]
+        total_classes = sum(statuses.values())
+        present_count = statuses['present']
+
+        row = {
+            'student': student,
+            'statuses': dict(statuses),
+            'total_classes': total_classes,
+            'present_count': present_count,
+            'absent_count': statuses['absent'],
+            'late_count': statuses['late'],
+            'excused_count': statuses['excused'],
+            'attendance_percentage': round((present_count / total_classes) * 100, 2) if total_classes else 0,
+        }
+        if per_day:
+            row['days'] = [register_cell(day_counts[student.id].get(day)) for day in days]
+        rows.append(row)
+
+    return rows, days
+
+
+def register_cell(statuses):
+    """Summarise one student-day as a register mark (P, A, L, E, or present/total)."""
+    if not statuses:
+        return ''
+    total = sum(statuses.values())
+    for status, mark in (('present', 'P'), ('absent', 'A'), ('late', 'L'), ('excused', 'E')):
+        if statuses.get(status) == total:
+            return mark
+    return f"{statuses.get('present', 0)}/{total}"
+
+
+def student_attendance_summary(student):
+    """
+    Return all attendance statistics of one student.
+
+    The status counts, the per-subject breakdown and the per-month series all
+    come from one grouped query. The result is cached for a few minutes under
+    the student's summary version, which every record insert, status change
+    and delete bumps (see ``attendance.reports``), so changes show up at once.
+    """
+    cache_key = f"attendance_summary:{student.pk}:{summary_version(student.pk)}"
+    summary = cache.get(cache_key)
+    if summary is None:
+        summary = build_student_summary(student)
+        cache.set(cache_key, summary, SUMMARY_CACHE_TIMEOUT)
+    return summary
+
+
+def build_student_summary(student):
+    rows = AttendanceRecord.objects.filter(student=student).annotate(
+        year=ExtractYear('attendance__date'),
+        month=ExtractMonth('attendance__date'),
+    ).values('attendance__subject_id', 'attendance__subject__name', 'year', 'month').annotate(
+        **{status: Count('id', filter=Q(status=status)) for status in STATUSES}
+    ).order_by()
+    archived_rows = archived_records().filter(student_id=student.pk).annotate(
+        month=ExtractMonth('date'),
+    ).values('subject_id', 'year', 'month').annotate(
+        **{status: Count('id', filter=Q(status=status)) for status in STATUSES}
+    ).order_by()
+    archived_rows = list(archived_rows)
+    if archived_rows:
+        subject_codes = dict(Subject.objects.values_list('id', 'name'))
+        for row in archived_rows:
+            row['attendance__subject_id'] = row['subject_id']
+            row['attendance__subject__name'] = subject_codes.get(row['subject_id'], row['subject_id'])
+
+    subject_names = dict(Subject.SUBJECT_CHOICES)
+    totals = new_counts()
+    subjects = {}
+    months = {}
+    for row in chain(rows, archived_rows):
+        subject = subjects.setdefault(row['attendance__subject_id'], new_counts(
+            subject_id=row['attendance__subject_id'],
+            subject=subject_names.get(row['attendance__subject__name'], row['attendance__subject__name']),
+        ))
+        month = months.setdefault((row['year'], row['month']), new_counts(
+            year=row['year'], month=row['month'],
+        ))
+        for counts in (totals, subject, month):
+            for status in STATUSES:
+                counts[status] += row[status]
+                counts['total'] += row[status]
+
+    for counts in [totals, *subjects.values(), *months.values()]:
+        counts['attendance_percentage'] = (
+            round((counts['present'] / counts['total']) * 100, 2) if counts['total'] else 0
+        )
+
+    totals['subjects'] = sorted(subjects.values(), key=lambda counts: counts['subject'])
+    totals['months'] = [months[key] for key in sorted(months)]
+    return totals
+
+
+def new_counts(**extra):
+    counts = dict(extra, total=0)
+    counts.update({status: 0 for status in STATUSES})
+    return counts
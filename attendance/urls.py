@@ -21,7 +21,12 @@ urlpatterns = [
     
     # Class Reports
     path('class/<int:class_id>/summary/', views.class_attendance_summary, name='class_attendance_summary'),
+    path('analytics/', views.attendance_analytics, name='attendance_analytics'),
+    path('export/', views.export_register, name='export_register'),
     
     # API Endpoints
     path('api/students-by-class/', views.get_students_by_class, name='get_students_by_class'),
+    path('api/analytics/', views.attendance_analytics_api, name='attendance_analytics_api'),
+    path('api/my-summary/', views.my_attendance_summary_api, name='my_attendance_summary_api'),
+    path('api/sync/', views.sync_attendance_api, name='sync_attendance_api'),
 ]
\ No newline at end of file
@@ -1,21 +1,39 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse
+from django.http import JsonResponse, StreamingHttpResponse, FileResponse
+from django.views.decorators.http import require_POST
 from django.db.models import Q, Count
-from django.core.paginator import Paginator
-from datetime import datetime, date
+from django.db import transaction
+from datetime import datetime, date, timedelta
 import calendar
+import json
+import tempfile
+
+from accounts.roles import get_roles
+from school_management.pagination import KeysetPaginator
+from school_management.streaming import write_xlsx
 
 from .models import Attendance, AttendanceRecord, Student, Class, Subject, MonthlyReport
-from .forms import AttendanceForm, AttendanceFilterForm, StudentAttendanceFilterForm, BulkAttendanceForm
+from .forms import (
+    AttendanceForm, AttendanceFilterForm, StudentAttendanceFilterForm, BulkAttendanceForm,
+    ClassAttendanceSummaryForm, DateRangeForm, AttendanceExportForm
+)
+from .analytics import MAX_RANGE_DAYS, attendance_trends
+from .archive import archived_years
+from .exports import HEADER as REGISTER_HEADER, csv_lines, register_rows
+from .periods import month_range, period_q, range_q
+from .services import create_attendance_records, update_attendance_records, sync_attendance
+from .summaries import class_attendance_matrix, student_attendance_summary
 
 def is_teacher(user):
-    return user.groups.filter(name='Teachers').exists() or user.is_staff
+    return get_roles(user).is_teacher
 
 @login_required
 def attendance_list(request):
-    attendances = Attendance.objects.all().order_by('-date', '-created_at')
+    attendances = Attendance.objects.with_counts().select_related(
+        'class_info', 'subject'
+    ).order_by('-date', '-created_at')
     
     form = AttendanceFilterForm(request.GET)
     if form.is_valid():
@@ -33,10 +51,9 @@ def attendance_list(request):
         if subject:
             attendances = attendances.filter(subject=subject)
     
-    # Pagination
-    paginator = Paginator(attendances, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination, seeking past the last row shown rather than counting offsets
+    paginator = KeysetPaginator(attendances, 20)
+    page_obj = paginator.get_page(request.GET)
     
     context = {
         'attendances': page_obj,
@@ -119,28 +136,28 @@ def save_attendance(request):
     try:
         class_info = Class.objects.get(id=attendance_data['class_info_id'])
         subject = Subject.objects.get(id=attendance_data['subject_id'])
-        students = Student.objects.filter(class_info=class_info, is_active=True)
-        
-        # Create attendance record
-        attendance = Attendance.objects.create(
-            class_info=class_info,
-            subject=subject,
-            date=attendance_data['date'],
-            period=attendance_data['period'],
-            teacher=request.user
-        )
+        student_ids = Student.objects.filter(
+            class_info=class_info, is_active=True
+        ).values_list('id', flat=True)
         
-        # Create attendance records for each student
-        for student in students:
-            status = request.POST.get(f'status_{student.id}', 'present')
-            remarks = request.POST.get(f'remarks_{student.id}', '')
-            
-            AttendanceRecord.objects.create(
-                attendance=attendance,
-                student=student,
-                status=status,
-                remarks=remarks
+        # Create the attendance and all of its records in one transaction
+        with transaction.atomic():
+            attendance = Attendance.objects.create(
+                class_info=class_info,
+                subject=subject,
+                date=date.fromisoformat(attendance_data['date']),
+                period=attendance_data['period'],
+                teacher=request.user
             )
+            
+            create_attendance_records(attendance, [
+                (
+                    student_id,
+                    request.POST.get(f'status_{student_id}', 'present'),
+                    request.POST.get(f'remarks_{student_id}', ''),
+                )
+                for student_id in student_ids
+            ])
         
         # Clear session data
         if 'attendance_data' in request.session:
@@ -168,19 +185,19 @@ def attendance_detail(request, attendance_id):
 @user_passes_test(is_teacher)
 def edit_attendance(request, attendance_id):
     attendance = get_object_or_404(Attendance, id=attendance_id)
-    attendance_records = attendance.attendance_records.select_related('student').all()
+    attendance_records = list(attendance.attendance_records.select_related('student'))
     
     if request.method == 'POST':
-        for record in attendance_records:
-            status = request.POST.get(f'status_{record.student.id}')
-            remarks = request.POST.get(f'remarks_{record.student.id}', '')
-            
-            if status in ['present', 'absent', 'late', 'excused']:
-                record.status = status
-                record.remarks = remarks
-                record.save()
+        # Only the records that differ from the submitted form are written
+        changed = update_attendance_records(attendance_records, {
+            record.student_id: (
+                request.POST.get(f'status_{record.student_id}'),
+                request.POST.get(f'remarks_{record.student_id}', ''),
+            )
+            for record in attendance_records
+        })
         
-        messages.success(request, 'উপস্থিতি সফলভাবে আপডেট করা হয়েছে')
+        messages.success(request, f'উপস্থিতি সফলভাবে আপডেট করা হয়েছে ({changed} টি রেকর্ড পরিবর্তিত)')
         return redirect('attendance:attendance_detail', attendance_id=attendance.id)
     
     context = {
@@ -196,42 +213,42 @@ def my_attendance(request):
         return redirect('dashboard')
     
     student = request.user.student
+    summary = student_attendance_summary(student)
     attendance_records = AttendanceRecord.objects.filter(
         student=student
-    ).select_related('attendance', 'attendance__subject', 'attendance__class_info').order_by('-attendance__date')
-    
-    # Calculate statistics
-    total_classes = attendance_records.count()
-    present_count = attendance_records.filter(status='present').count()
-    absent_count = attendance_records.filter(status='absent').count()
-    
-    if total_classes > 0:
-        attendance_percentage = round((present_count / total_classes) * 100, 2)
-    else:
-        attendance_percentage = 0
+    ).select_related('attendance', 'attendance__subject', 'attendance__class_info').order_by('-attendance__date', '-id')
     
-    # Filter by month and year
+    # Filter by month and year; the page count comes from the monthly series.
+    # Only live records are listed, so archived years are left out of it.
+    month = year = None
     form = StudentAttendanceFilterForm(request.GET)
     if form.is_valid():
-        month = form.cleaned_data.get('month')
+        month = int(form.cleaned_data.get('month') or 0)
         year = form.cleaned_data.get('year')
         
-        if month:
-            attendance_records = attendance_records.filter(attendance__date__month=month)
-        if year:
-            attendance_records = attendance_records.filter(attendance__date__year=year)
+        if month or year:
+            attendance_records = attendance_records.filter(period_q(
+                'attendance__date', year=year, month=month,
+                years=[row['year'] for row in summary['months']],
+            ))
+    archived = set(archived_years())
+    record_count = sum(
+        row['total'] for row in summary['months']
+        if row['year'] not in archived
+        and (not month or row['month'] == month) and (not year or row['year'] == year)
+    )
     
-    # Pagination
-    paginator = Paginator(attendance_records, 20)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination; the total is already known from the summary
+    paginator = KeysetPaginator(attendance_records, 20, count=record_count)
+    page_obj = paginator.get_page(request.GET)
     
     context = {
         'attendance_records': page_obj,
-        'total_classes': total_classes,
-        'present_count': present_count,
-        'absent_count': absent_count,
-        'attendance_percentage': attendance_percentage,
+        'summary': summary,
+        'total_classes': summary['total'],
+        'present_count': summary['present'],
+        'absent_count': summary['absent'],
+        'attendance_percentage': summary['attendance_percentage'],
         'form': form,
         'page_obj': page_obj,
     }
@@ -249,7 +266,9 @@ def bulk_attendance(request):
             period = form.cleaned_data['period']
             default_status = form.cleaned_data['status']
             
-            students = Student.objects.filter(class_info=class_info, is_active=True)
+            student_ids = Student.objects.filter(
+                class_info=class_info, is_active=True
+            ).values_list('id', flat=True)
             
             # Check if attendance already exists
             existing_attendance = Attendance.objects.filter(
@@ -263,23 +282,20 @@ def bulk_attendance(request):
                 messages.warning(request, 'ইতিমধ্যেই উপস্থিতি নেওয়া হয়েছে')
                 return redirect('attendance:attendance_detail', attendance_id=existing_attendance.id)
             
-            # Create attendance record
-            attendance = Attendance.objects.create(
-                class_info=class_info,
-                subject=subject,
-                date=attendance_date,
-                period=period,
-                teacher=request.user
-            )
-            
             # Create attendance records for all students with default status
-            for student in students:
-                AttendanceRecord.objects.create(
-                    attendance=attendance,
-                    student=student,
-                    status=default_status,
-                    remarks='বাল্ক এন্ট্রি'
+            with transaction.atomic():
+                attendance = Attendance.objects.create(
+                    class_info=class_info,
+                    subject=subject,
+                    date=attendance_date,
+                    period=period,
+                    teacher=request.user
                 )
+                
+                create_attendance_records(attendance, [
+                    (student_id, default_status, 'বাল্ক এন্ট্রি')
+                    for student_id in student_ids
+                ])
             
             messages.success(request, f'{class_info} শ্রেণীর জন্য বাল্ক উপস্থিতি সফলভাবে সংরক্ষণ করা হয়েছে')
             return redirect('attendance:attendance_detail', attendance_id=attendance.id)
@@ -307,16 +323,23 @@ def attendance_report(request):
         year=current_year
     ).order_by('month')
     
+    summary = student_attendance_summary(student)
+    current_month_summary = next(
+        (row for row in summary['months'] if row['year'] == current_year and row['month'] == current_month),
+        None
+    )
+    
     # Get current month attendance
-    current_month_attendance = AttendanceRecord.objects.filter(
+    current_month_attendance = list(AttendanceRecord.objects.filter(
+        range_q('attendance__date', *month_range(current_year, current_month)),
         student=student,
-        attendance__date__year=current_year,
-        attendance__date__month=current_month
-    )
+    ).select_related('attendance', 'attendance__subject').order_by('attendance__date', 'attendance__period'))
     
     context = {
         'student': student,
         'monthly_reports': monthly_reports,
+        'summary': summary,
+        'current_month_summary': current_month_summary,
         'current_month_attendance': current_month_attendance,
         'current_year': current_year,
         'current_month': current_month,
@@ -327,46 +350,93 @@ def attendance_report(request):
 @user_passes_test(is_teacher)
 def class_attendance_summary(request, class_id):
     class_info = get_object_or_404(Class, id=class_id)
-    students = Student.objects.filter(class_info=class_info, is_active=True)
     
-    # Get current month and year
+    # Defaults to the current month; any date range can be requested
     today = date.today()
-    current_month = today.month
-    current_year = today.year
-    
-    # Calculate attendance for each student
-    student_attendance = []
-    for student in students:
-        monthly_attendance = AttendanceRecord.objects.filter(
-            student=student,
-            attendance__date__year=current_year,
-            attendance__date__month=current_month
-        )
-        
-        total_classes = monthly_attendance.count()
-        present_count = monthly_attendance.filter(status='present').count()
-        
-        if total_classes > 0:
-            attendance_percentage = round((present_count / total_classes) * 100, 2)
-        else:
-            attendance_percentage = 0
-        
-        student_attendance.append({
-            'student': student,
-            'total_classes': total_classes,
-            'present_count': present_count,
-            'attendance_percentage': attendance_percentage,
-        })
+    start_date = today.replace(day=1)
+    end_date = today.replace(day=calendar.monthrange(today.year, today.month)[1])
+    per_day = False
+    
+    form = ClassAttendanceSummaryForm(request.GET or None)
+    if form.is_valid():
+        start_date = form.cleaned_data.get('start_date') or start_date
+        end_date = form.cleaned_data.get('end_date') or end_date
+        per_day = form.cleaned_data.get('per_day')
+    
+    student_attendance, days = class_attendance_matrix(class_info, start_date, end_date, per_day=per_day)
     
     context = {
         'class_info': class_info,
         'student_attendance': student_attendance,
-        'current_month': current_month,
-        'current_year': current_year,
-        'month_name': calendar.month_name[current_month],
+        'days': days,
+        'form': form,
+        'start_date': start_date,
+        'end_date': end_date,
+        'current_month': start_date.month,
+        'current_year': start_date.year,
+        'month_name': calendar.month_name[start_date.month],
     }
     return render(request, 'attendance/class_attendance_summary.html', context)
 
+def analytics_date_range(request):
+    end_date = date.today()
+    start_date = end_date - timedelta(days=89)
+    
+    form = DateRangeForm(request.GET or None)
+    if form.is_valid():
+        start = form.cleaned_data.get('start_date') or start_date
+        end = form.cleaned_data.get('end_date') or end_date
+        # Checked again with the defaults filled in, e.g. a start date after today
+        if start > end:
+            form.add_error(None, 'শুরুর তারিখ শেষ তারিখের পরে হতে পারে না')
+        elif (end - start).days >= MAX_RANGE_DAYS:
+            form.add_error(None, f'সর্বোচ্চ {MAX_RANGE_DAYS} দিনের বিশ্লেষণ দেখা যায়')
+        else:
+            start_date, end_date = start, end
+    return form, start_date, end_date
+
+@login_required
+@user_passes_test(is_teacher)
+def attendance_analytics(request):
+    form, start_date, end_date = analytics_date_range(request)
+    trends = attendance_trends(start_date, end_date)
+    
+    context = {
+        'form': form,
+        'trends': trends,
+        'start_date': start_date,
+        'end_date': end_date,
+    }
+    return render(request, 'attendance/attendance_analytics.html', context)
+
+@login_required
+@user_passes_test(is_teacher)
+def export_register(request):
+    form = AttendanceExportForm(request.GET or None)
+    if 'download' not in request.GET or not form.is_valid():
+        return render(request, 'attendance/export_register.html', {'form': form})
+    
+    # Defaults to the current month
+    today = date.today()
+    start_date = form.cleaned_data.get('start_date') or today.replace(day=1)
+    end_date = form.cleaned_data.get('end_date') or today.replace(day=calendar.monthrange(today.year, today.month)[1])
+    class_info = form.cleaned_data.get('class_info')
+    
+    filename = f"attendance_register_{class_info.id if class_info else 'all'}_{start_date}_{end_date}"
+    rows = register_rows(start_date, end_date, class_info=class_info)
+    
+    if form.cleaned_data.get('format') == 'xlsx':
+        # Write-only rows are flushed to disk as they are appended, so only
+        # the finished file is served
+        output = tempfile.TemporaryFile()
+        write_xlsx(rows, output, REGISTER_HEADER, 'Attendance Register')
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=f'{filename}.xlsx')
+    
+    response = StreamingHttpResponse(csv_lines(rows), content_type='text/csv; charset=utf-8')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
 # API Views for AJAX calls
 @login_required
 def get_students_by_class(request):
@@ -379,4 +449,37 @@ def get_students_by_class(request):
             'name': student.name,
         } for student in students]
         return JsonResponse(student_data, safe=False)
-    return JsonResponse([], safe=False)
\ No newline at end of file
+    return JsonResponse([], safe=False)
+
+@login_required
+@user_passes_test(is_teacher)
+def attendance_analytics_api(request):
+    form, start_date, end_date = analytics_date_range(request)
+    if form.errors:
+        return JsonResponse({'errors': form.errors}, status=400)
+    return JsonResponse(attendance_trends(start_date, end_date))
+
+@login_required
+def my_attendance_summary_api(request):
+    if not hasattr(request.user, 'student'):
+        return JsonResponse({'error': 'আপনি একজন শিক্ষার্থী নন'}, status=403)
+    return JsonResponse(student_attendance_summary(request.user.student))
+
+@login_required
+@user_passes_test(is_teacher)
+@require_POST
+def sync_attendance_api(request):
+    try:
+        payload = json.loads(request.body)
+    except (ValueError, UnicodeDecodeError):
+        return JsonResponse({'error': 'Invalid JSON'}, status=400)
+    
+    items = payload.get('items') if isinstance(payload, dict) else None
+    if not isinstance(items, list):
+        return JsonResponse({'error': 'items must be a list'}, status=400)
+    
+    results = sync_attendance(items, request.user)
+    return JsonResponse({
+        'results': results,
+        'errors': sum(1 for result in results if result['status'] == 'error'),
+    })
\ No newline at end of file
@@ -1,11 +1,33 @@
-from django.contrib import admin
-from .models import Class, Subject, Student, Result, GradeSystem
+from django.conf import settings
+from django.contrib import admin, messages
+from django.utils.html import format_html
+import os
+
+from .models import Class, Subject, Student, Result, GradeSystem, ClassRanking
+from .report_cards import generate_report_cards
 
 @admin.register(Class)
 class ClassAdmin(admin.ModelAdmin):
     list_display = ['name', 'section', 'created_at']
     list_filter = ['created_at']
     search_fields = ['name', 'section']
+    actions = ['generate_report_cards']
+
+    @admin.action(description='Generate report cards for selected classes')
+    def generate_report_cards(self, request, queryset):
+        for student_class in queryset:
+            exam_types = list(
+                Result.objects.filter(student_class=student_class).values_list('exam_type', flat=True).distinct().order_by('exam_type')
+            )
+            if not exam_types:
+                self.message_user(request, f'{student_class} has no results.', messages.WARNING)
+                continue
+            # Rendered in the request; use the generate_report_cards command for a whole school
+            path, count = generate_report_cards(student_class, exam_types)
+            self.message_user(request, format_html(
+                '{}: {} report cards. <a href="{}">Download ZIP</a>',
+                student_class, count, settings.MEDIA_URL + path.replace(os.sep, '/'),
+            ))
 
 @admin.register(Subject)
 class SubjectAdmin(admin.ModelAdmin):
@@ -37,4 +59,11 @@ class ResultAdmin(admin.ModelAdmin):
 @admin.register(GradeSystem)
 class GradeSystemAdmin(admin.ModelAdmin):
     list_display = ['grade', 'min_percentage', 'max_percentage', 'gpa', 'description']
-    list_editable = ['min_percentage', 'max_percentage', 'gpa']
\ No newline at end of file
+    list_editable = ['min_percentage', 'max_percentage', 'gpa']
+
+@admin.register(ClassRanking)
+class ClassRankingAdmin(admin.ModelAdmin):
+    list_display = ['student', 'student_class', 'exam_type', 'total_marks', 'average_gpa', 'position', 'student_count', 'updated_at']
+    list_filter = ['student_class', 'exam_type']
+    search_fields = ['student__name', 'student__roll_number']
+    readonly_fields = ['student', 'student_class', 'exam_type', 'total_marks', 'average_percentage', 'average_gpa', 'subject_count', 'position', 'student_count', 'updated_at']
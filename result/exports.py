@@ -0,0 +1,71 @@
+"""
+Result exports.
+
+Rows are read with ``values_list(...).iterator()`` ordered by class, exam
+and student, and written out as they arrive, either as CSV chunks for
+``StreamingHttpResponse`` or into an openpyxl write-only workbook. Each row
+carries its student's total marks and GPA for the exam, computed in the
+same pass by holding back only the current student's rows, and the class
+position from ``ClassRanking`` through a subquery, so memory use stays flat
+however many results are exported.
+"""
+import csv
+from itertools import groupby
+from operator import itemgetter
+
+from django.db.models import OuterRef, Subquery
+
+from school_management.streaming import Echo
+
+from .models import ClassRanking, Result
+
+HEADER = [
+    'Class', 'Section', 'Exam', 'Roll No', 'Student', 'Subject Code', 'Subject',
+    'Marks Obtained', 'Total Marks', 'Percentage', 'Grade', 'GPA',
+    'Student Total', 'Student GPA', 'Position',
+]
+
+EXAM_LABELS = dict(Result.EXAM_TYPES)
+
+
+def result_rows(student_class=None, exam_type=None):
+    """Yield one export row per result, optionally of one class and/or exam."""
+    results = Result.objects.all()
+    if student_class:
+        results = results.filter(student_class=student_class)
+    if exam_type:
+        results = results.filter(exam_type=exam_type)
+
+    position = ClassRanking.objects.filter(
+        student=OuterRef('student'),
+        student_class=OuterRef('student_class'),
+        exam_type=OuterRef('exam_type'),
+    ).values('position')[:1]
+
+    rows = results.annotate(position=Subquery(position)).order_by(
+        'student_class_id', 'exam_type', 'student__roll_number', 'subject__name',
+    ).values_list(
+        'student_class_id', 'exam_type', 'student_id',
+        'student_class__name', 'student_class__section', 'student__roll_number', 'student__name',
+        'subject__code', 'subject__name', 'marks_obtained', 'total_marks', 'percentage', 'grade', 'gpa',
+        'position',
+    ).iterator(chunk_size=2000)
+
+    # Rows of one student and exam are contiguous; only they are held back
+    for key, student_rows in groupby(rows, key=itemgetter(0, 1, 2)):
+        student_rows = list(student_rows)
+        total = sum(row[9] for row in student_rows)
+        gpa = round(sum(row[13] for row in student_rows) / len(student_rows), 2)
+        for (class_id, exam, student_id, class_name, section, roll_number, name,
+             code, subject, marks, total_marks, percentage, grade, subject_gpa, rank) in student_rows:
+            yield [
+                class_name, section, EXAM_LABELS.get(exam, exam), roll_number, name, code, subject,
+                marks, total_marks, percentage, grade, subject_gpa, total, gpa, rank,
+            ]
+
+
+def csv_lines(rows, header=HEADER):
+    writer = csv.writer(Echo())
+    yield writer.writerow(header)
+    for row in rows:
+        yield writer.writerow(row)
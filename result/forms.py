@@ -55,6 +55,45 @@ class ResultFilterForm(forms.Form):
         widget=forms.Select(attrs={'class': 'form-select'})
     )
 
+class TabulationForm(forms.Form):
+    student_class = forms.ModelChoiceField(
+        queryset=Class.objects.all(),
+        label='Class',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    exam_type = forms.ChoiceField(
+        choices=Result.EXAM_TYPES,
+        label='Exam',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    format = forms.ChoiceField(
+        choices=[('html', 'View'), ('csv', 'CSV'), ('xlsx', 'Excel (XLSX)')],
+        initial='html',
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
+class ResultExportForm(forms.Form):
+    student_class = forms.ModelChoiceField(
+        queryset=Class.objects.all(),
+        required=False,
+        empty_label='All Classes',
+        label='Class',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    exam_type = forms.ChoiceField(
+        choices=[('', 'All Exams')] + list(Result.EXAM_TYPES),
+        required=False,
+        label='Exam',
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+    format = forms.ChoiceField(
+        choices=[('csv', 'CSV'), ('xlsx', 'Excel (XLSX)')],
+        initial='csv',
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'})
+    )
+
 class GradeSystemForm(forms.ModelForm):
     class Meta:
         model = GradeSystem
@@ -0,0 +1,194 @@
+"""
+Table-driven grading.
+
+The ``GradeSystem`` bands are loaded once into a table sorted by minimum
+percentage and kept for the life of the process; grade and GPA are then
+found by binary search, so grading a result costs no queries. Saving or
+deleting a band clears the table (see ``result.signals``), and a short TTL
+lets other worker processes pick up changes made elsewhere. Without any
+``GradeSystem`` rows the school's standard scale below is used.
+
+A student's overall grade for an exam is the band of their overall
+percentage, except that failing any subject (GPA 0) fails the exam;
+``overall_grade`` and ``GradingTable.overall_grades`` implement that one
+rule for report cards, tabulation sheets and the student's results page.
+"""
+from bisect import bisect_right
+from decimal import Decimal
+import threading
+import time
+
+from django.db import transaction
+from django.db.models import Case, Count, DecimalField, F, FloatField, Q, Value, When
+from django.db.models.functions import Abs, Cast, Round
+from django.db.models.lookups import GreaterThan, GreaterThanOrEqual
+from django.utils import timezone
+import numpy as np
+
+from .models import GradeSystem
+from .rankings import refresh_rankings
+from .statistics import bump_results_version
+
+# (min percentage, grade, GPA), used while GradeSystem is empty
+DEFAULT_BANDS = [
+    (Decimal('0'), 'F', Decimal('0.00')),
+    (Decimal('33'), 'D', Decimal('1.00')),
+    (Decimal('40'), 'C', Decimal('2.00')),
+    (Decimal('50'), 'B', Decimal('3.00')),
+    (Decimal('60'), 'A-', Decimal('3.50')),
+    (Decimal('70'), 'A', Decimal('4.00')),
+    (Decimal('80'), 'A+', Decimal('5.00')),
+]
+
+# Percentages below the lowest configured band
+FAIL_GRADE = ('F', Decimal('0.00'))
+
+CACHE_TTL = 300
+
+# Half a hundredth, plus room for float error
+PERCENTAGE_TOLERANCE = 0.005 + 1e-9
+
+_lock = threading.Lock()
+_table = None
+
+
+class GradingTable:
+    def __init__(self, bands):
+        bands = sorted(bands)
+        self.minimums = [band[0] for band in bands]
+        self.grades = [band[1] for band in bands]
+        self.gpas = [band[2] for band in bands]
+        self.loaded_at = time.monotonic()
+
+        self.minimum_array = np.array([float(value) for value in self.minimums])
+        self.grade_array = np.array(self.grades + [FAIL_GRADE[0]], dtype=object)
+        self.gpa_array = np.array([float(value) for value in self.gpas] + [float(FAIL_GRADE[1])])
+
+    def grade(self, percentage):
+        """Return ``(grade, gpa)`` for one percentage."""
+        index = bisect_right(self.minimums, Decimal(str(percentage))) - 1
+        if index < 0:
+            return FAIL_GRADE
+        return self.grades[index], self.gpas[index]
+
+    def grade_many(self, percentages):
+        """Return ``(grades, gpas)`` arrays for an array of percentages."""
+        indexes = np.searchsorted(self.minimum_array, np.asarray(percentages, dtype=float), side='right') - 1
+        # -1 (below every band) picks the trailing fail entry
+        return self.grade_array[indexes], self.gpa_array[indexes]
+
+    def overall_grade(self, percentage, subject_gpas):
+        """Return the overall grade of one student from their percentage and subject GPAs."""
+        if any(gpa == 0 for gpa in subject_gpas):
+            return self.fail_grade
+        return self.grade(percentage)[0]
+
+    def overall_grades(self, percentages, failed):
+        """Array version of ``overall_grade``; ``failed`` flags the students who failed a subject."""
+        grades, _ = self.grade_many(percentages)
+        grades[np.asarray(failed, dtype=bool)] = self.fail_grade
+        return grades
+
+    def case_expressions(self, percentage):
+        """Return SQL ``(grade, gpa)`` CASE expressions over the ``percentage`` expression."""
+        grade_whens = []
+        gpa_whens = []
+        for minimum, grade, gpa in reversed(list(zip(self.minimums, self.grades, self.gpas))):
+            grade_whens.append(When(GreaterThanOrEqual(percentage, minimum), then=Value(grade)))
+            gpa_whens.append(When(GreaterThanOrEqual(percentage, minimum), then=Value(gpa)))
+        return (
+            Case(*grade_whens, default=Value(FAIL_GRADE[0])),
+            Case(*gpa_whens, default=Value(FAIL_GRADE[1]), output_field=DecimalField(max_digits=3, decimal_places=2)),
+        )
+
+    @property
+    def top_grade(self):
+        return self.grades[-1] if self.grades else FAIL_GRADE[0]
+
+    @property
+    def fail_grade(self):
+        return self.grades[0] if self.grades and self.gpas[0] == 0 else FAIL_GRADE[0]
+
+    def expired(self):
+        return time.monotonic() - self.loaded_at > CACHE_TTL
+
+
+def load_table():
+    bands = list(GradeSystem.objects.values_list('min_percentage', 'grade', 'gpa'))
+    return GradingTable(bands or DEFAULT_BANDS)
+
+
+def get_table():
+    """Return the process-wide grading table, loading it on first use."""
+    global _table
+    table = _table
+    if table is None or table.expired():
+        with _lock:
+            if _table is None or _table.expired():
+                _table = load_table()
+            table = _table
+    return table
+
+
+def invalidate():
+    """Drop the table so the next lookup reloads ``GradeSystem``."""
+    global _table
+    _table = None
+
+
+def grade_for(percentage):
+    return get_table().grade(percentage)
+
+
+def grade_many(percentages):
+    return get_table().grade_many(percentages)
+
+
+def overall_grade(percentage, subject_gpas):
+    return get_table().overall_grade(percentage, subject_gpas)
+
+
+def regrade_results(results, dry_run=False):
+    """
+    Recompute percentage, grade and GPA of every result in ``results``.
+
+    Runs as a single UPDATE with CASE expressions built from the current
+    grading table, touching only the rows whose values change. Returns
+    ``(changed, transitions)`` where transitions counts rows per
+    ``(old grade, new grade)``; with ``dry_run`` nothing is written.
+    """
+    invalidate()
+    # SQLite hands back whole-number decimals as integers; divide as floats
+    # so the SQL agrees with Result.calculate_grade
+    exact = Cast(F('marks_obtained'), FloatField()) * 100 / Cast(F('total_marks'), FloatField())
+    percentage = Round(exact, 2)
+    grade, gpa = get_table().case_expressions(exact)
+
+    # A stored percentage is current if it is any rounding of the exact one
+    changed_results = results.filter(
+        Q(GreaterThan(Abs(Cast(F('percentage'), FloatField()) - exact), PERCENTAGE_TOLERANCE))
+        | ~Q(grade=grade)
+        | ~Q(gpa=gpa)
+    )
+    transitions = {
+        (row['grade'], row['new_grade']): row['count']
+        for row in changed_results.annotate(new_grade=grade).values('grade', 'new_grade').annotate(
+            count=Count('id')
+        ).order_by()
+    }
+
+    if dry_run:
+        return sum(transitions.values()), transitions
+
+    keys = list(changed_results.values_list('student_class_id', 'exam_type').distinct().order_by())
+    with transaction.atomic():
+        changed = changed_results.order_by().update(
+            percentage=percentage,
+            grade=grade,
+            gpa=gpa,
+            updated_at=timezone.now(),
+        )
+        # Averages in the class rankings depend on the grades
+        refresh_rankings(keys)
+    bump_results_version(class_id for class_id, exam_type in keys)
+    return changed, transitions
@@ -0,0 +1,285 @@
+"""
+Staged CSV import of results.
+
+The upload is handled in stages instead of row by row: every line is parsed
+and validated first, then all roll numbers are resolved with one query and
+the already existing (student, subject, exam type) keys with another. The
+new results are graded in memory and written with one ``bulk_create`` inside
+a single transaction. Rejected lines are collected into a per-line error
+report that can be downloaded as CSV afterwards.
+
+The ``import_results`` command uses the chunked variant below: lookups are
+loaded once, chunks of rows are validated and graded without touching the
+database (so they can run in worker processes) and a single writer inserts
+each chunk.
+"""
+import csv
+from decimal import Decimal, InvalidOperation
+import io
+from operator import itemgetter
+import uuid
+
+from django.db import transaction
+
+from .grading import GradingTable
+from .models import Class, Result, Student, Subject
+from .rankings import refresh_rankings
+from .statistics import bump_results_version
+
+BULK_BATCH_SIZE = 500
+
+DEFAULT_TOTAL_MARKS = Decimal('100')
+
+ERROR_REPORT_SESSION_KEY = 'result_import_errors'
+
+ERROR_REPORT_HEADER = ['line', 'roll_number', 'marks_obtained', 'error']
+
+
+class ImportReport:
+    def __init__(self):
+        self.created = 0
+        self.errors = []
+
+    def add_error(self, line, roll_number, marks, message):
+        self.errors.append((line, roll_number, marks, message))
+
+    def error_messages(self):
+        return [f"Line {line}: {message}" for line, roll_number, marks, message in self.errors]
+
+    def errors_csv(self):
+        output = io.StringIO()
+        writer = csv.writer(output)
+        writer.writerow(ERROR_REPORT_HEADER)
+        writer.writerows(sorted(self.errors, key=itemgetter(0)))
+        return output.getvalue()
+
+
+def parse_marks(value, total_marks):
+    try:
+        marks = Decimal(value.strip())
+    except (InvalidOperation, AttributeError):
+        raise ValueError("Invalid marks format")
+    if not marks.is_finite() or marks < 0 or marks > total_marks:
+        raise ValueError(f"Marks must be between 0 and {total_marks}")
+    return marks
+
+
+def import_uploaded_results(csv_file, student_class, subject, exam_type, user, total_marks=DEFAULT_TOTAL_MARKS):
+    """
+    Import a ``roll_number,marks_obtained`` CSV for one class, subject and exam.
+
+    Runs a fixed number of queries whatever the size of the file. Returns an
+    ``ImportReport`` with the number of results created and every rejected line.
+    """
+    report = ImportReport()
+    reader = csv.reader(io.StringIO(csv_file.read().decode('utf-8-sig')), delimiter=',')
+
+    # Skip header
+    next(reader, None)
+
+    # Stage 1: parse and validate every line
+    rows = []
+    for line, row in enumerate(reader, 2):
+        if not any(cell.strip() for cell in row):
+            continue
+        roll_number = row[0].strip() if row else ''
+        if len(row) < 2:
+            report.add_error(line, roll_number, '', "Expected roll_number and marks_obtained")
+            continue
+        try:
+            marks = parse_marks(row[1], total_marks)
+        except ValueError as e:
+            report.add_error(line, roll_number, row[1], str(e))
+            continue
+        rows.append((line, roll_number, marks))
+
+    # Stage 2: resolve all roll numbers and existing results in two queries
+    students = {}
+    names = {}
+    for student_id, roll_number, name in Student.objects.filter(
+        current_class=student_class,
+        roll_number__in={roll_number for line, roll_number, marks in rows},
+    ).values_list('id', 'roll_number', 'name'):
+        students[roll_number] = student_id
+        names[student_id] = name
+    existing = set(Result.objects.filter(
+        subject=subject,
+        exam_type=exam_type,
+        student_id__in=students.values(),
+    ).values_list('student_id', flat=True))
+
+    # Stage 3: grade in memory
+    results = []
+    for line, roll_number, marks in rows:
+        student_id = students.get(roll_number)
+        if student_id is None:
+            report.add_error(line, roll_number, marks, f"Student with roll number {roll_number} not found in selected class")
+            continue
+        if student_id in existing:
+            report.add_error(line, roll_number, marks, f"Result already exists for {names[student_id]}")
+            continue
+
+        result = Result(
+            student_id=student_id,
+            student_class=student_class,
+            subject=subject,
+            exam_type=exam_type,
+            marks_obtained=marks,
+            total_marks=total_marks,
+            created_by=user,
+        )
+        result.calculate_grade()
+        results.append(result)
+        # A roll number repeated in the file counts as an existing result
+        existing.add(student_id)
+
+    # Stage 4: write everything at once
+    with transaction.atomic():
+        Result.objects.bulk_create(results, batch_size=BULK_BATCH_SIZE)
+        if results:
+            refresh_rankings([(student_class.id, exam_type)])
+    if results:
+        bump_results_version([student_class.id], [result.student_id for result in results])
+    report.created = len(results)
+    return report
+
+
+def store_error_report(session, report):
+    """
+    Keep the error report of the last upload in the session.
+
+    Returns the token for the download URL; a newer upload replaces it.
+    """
+    token = uuid.uuid4().hex
+    session[ERROR_REPORT_SESSION_KEY] = {'token': token, 'csv': report.errors_csv()}
+    return token
+
+
+def load_error_report(session, token):
+    stored = session.get(ERROR_REPORT_SESSION_KEY)
+    if not stored or stored['token'] != token:
+        return None
+    return stored['csv']
+
+
+IMPORT_COLUMNS = ['roll_number', 'subject_code', 'class_name', 'exam_type', 'marks_obtained', 'total_marks']
+
+EXAM_TYPES = {choice[0] for choice in Result.EXAM_TYPES}
+
+
+def load_import_lookups():
+    """Resolve roll numbers, subject codes and class names to ids, one query each."""
+    classes = {}
+    for class_id, name in Class.objects.values_list('id', 'name'):
+        # A name shared by several sections cannot be resolved from the CSV
+        classes[name] = None if name in classes else class_id
+    return {
+        'students': dict(Student.objects.values_list('roll_number', 'id')),
+        'subjects': dict(Subject.objects.values_list('code', 'id')),
+        'classes': classes,
+    }
+
+
+def validate_rows(rows, lookups, table):
+    """
+    Validate and grade ``(line, row dict)`` pairs without touching the database.
+
+    Returns ``(valid, errors)``: valid entries are tuples ready for
+    ``write_results`` and errors are ``(line, roll_number, marks, message)``.
+    """
+    valid = []
+    errors = []
+    for line, row in rows:
+        roll_number = (row.get('roll_number') or '').strip()
+        marks_value = (row.get('marks_obtained') or '').strip()
+        try:
+            student_id = lookups['students'].get(roll_number)
+            if student_id is None:
+                raise ValueError(f"Student with roll number {roll_number} not found")
+            subject_code = (row.get('subject_code') or '').strip()
+            subject_id = lookups['subjects'].get(subject_code)
+            if subject_id is None:
+                raise ValueError(f"Subject {subject_code} not found")
+            class_name = (row.get('class_name') or '').strip()
+            if class_name not in lookups['classes']:
+                raise ValueError(f"Class {class_name} not found")
+            class_id = lookups['classes'][class_name]
+            if class_id is None:
+                raise ValueError(f"Class name {class_name} matches more than one class")
+            exam_type = (row.get('exam_type') or '').strip()
+            if exam_type not in EXAM_TYPES:
+                raise ValueError(f"Invalid exam type {exam_type}")
+
+            total_marks = (row.get('total_marks') or '').strip()
+            try:
+                total_marks = Decimal(total_marks) if total_marks else DEFAULT_TOTAL_MARKS
+            except InvalidOperation:
+                raise ValueError("Invalid total marks format")
+            if not total_marks.is_finite() or total_marks < 1:
+                raise ValueError("Total marks must be at least 1")
+            marks = parse_marks(marks_value, total_marks)
+        except ValueError as e:
+            errors.append((line, roll_number, marks_value, str(e)))
+            continue
+
+        percentage = (marks / total_marks) * 100
+        grade, gpa = table.grade(percentage)
+        valid.append((line, student_id, class_id, subject_id, exam_type, marks, total_marks, percentage, grade, gpa))
+    return valid, errors
+
+
+_worker_state = {}
+
+
+def init_import_worker(lookups, bands):
+    """Process pool initializer: keep the lookups and grading table per worker."""
+    _worker_state['lookups'] = lookups
+    _worker_state['table'] = GradingTable(bands)
+
+
+def validate_chunk(rows):
+    return validate_rows(rows, _worker_state['lookups'], _worker_state['table'])
+
+
+def write_results(valid, created_by_id):
+    """
+    Insert validated rows in one transaction, skipping keys that already exist.
+
+    Returns ``(created, skipped)`` where ``skipped`` lists the lines whose
+    (student, subject, exam type) result is already stored or repeated.
+    """
+    existing = set(Result.objects.filter(
+        student_id__in={entry[1] for entry in valid},
+        subject_id__in={entry[3] for entry in valid},
+        exam_type__in={entry[4] for entry in valid},
+    ).values_list('student_id', 'subject_id', 'exam_type').order_by())
+
+    results = []
+    skipped = []
+    for line, student_id, class_id, subject_id, exam_type, marks, total_marks, percentage, grade, gpa in valid:
+        key = (student_id, subject_id, exam_type)
+        if key in existing:
+            skipped.append(line)
+            continue
+        existing.add(key)
+        results.append(Result(
+            student_id=student_id,
+            student_class_id=class_id,
+            subject_id=subject_id,
+            exam_type=exam_type,
+            marks_obtained=marks,
+            total_marks=total_marks,
+            percentage=percentage,
+            grade=grade,
+            gpa=gpa,
+            created_by_id=created_by_id,
+        ))
+
+    with transaction.atomic():
+        Result.objects.bulk_create(results, batch_size=BULK_BATCH_SIZE)
+    if results:
+        bump_results_version(
+            [result.student_class_id for result in results],
+            [result.student_id for result in results],
+        )
+    return len(results), skipped
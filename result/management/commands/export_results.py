@@ -0,0 +1,39 @@
+from django.core.management.base import BaseCommand, CommandError
+import time
+
+from result.exports import HEADER, csv_lines, result_rows
+from result.models import Class, Result
+from school_management.streaming import CountedRows, write_xlsx
+
+
+class Command(BaseCommand):
+    help = "Export results with each student's total, GPA and class position as CSV or XLSX"
+
+    def add_arguments(self, parser):
+        parser.add_argument('output', type=str, help='Path of the file to write')
+        parser.add_argument('--class', dest='class_id', type=int, help='Only export this class id')
+        parser.add_argument('--exam-type', choices=[choice[0] for choice in Result.EXAM_TYPES], help='Only export this exam type')
+        parser.add_argument('--format', choices=['csv', 'xlsx'], help='Output format, defaults to the extension of the output file')
+
+    def handle(self, *args, **kwargs):
+        student_class = None
+        if kwargs['class_id']:
+            try:
+                student_class = Class.objects.get(id=kwargs['class_id'])
+            except Class.DoesNotExist:
+                raise CommandError(f'Class {kwargs["class_id"]} does not exist')
+
+        output = kwargs['output']
+        export_format = kwargs['format'] or ('xlsx' if output.lower().endswith('.xlsx') else 'csv')
+
+        started = time.perf_counter()
+        rows = CountedRows(result_rows(student_class=student_class, exam_type=kwargs['exam_type']))
+        if export_format == 'xlsx':
+            write_xlsx(rows, output, HEADER, 'Results')
+        else:
+            with open(output, 'w', encoding='utf-8', newline='') as file:
+                for line in csv_lines(rows):
+                    file.write(line)
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(self.style.SUCCESS(f'Exported {rows.count} results to {output} in {elapsed:.2f}s'))
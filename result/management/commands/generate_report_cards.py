@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.conf import settings
+import os
+import time
+
+from result.models import Class, Result
+from result.report_cards import generate_report_cards
+
+
+class Command(BaseCommand):
+    help = 'Render the report cards of whole classes into ZIP archives of printable HTML under MEDIA_ROOT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--class', type=int, nargs='+', dest='classes', help='Class ids, defaults to every class')
+        parser.add_argument('--exam-type', nargs='+', dest='exam_types', choices=[choice[0] for choice in Result.EXAM_TYPES], help='Exam types, defaults to every exam with results')
+        parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Processes used to render the cards')
+
+    def handle(self, *args, **kwargs):
+        if kwargs['workers'] < 1:
+            raise CommandError('--workers must be positive')
+
+        classes = Class.objects.order_by('name', 'section')
+        if kwargs['classes']:
+            classes = classes.filter(id__in=kwargs['classes'])
+            missing = set(kwargs['classes']) - {student_class.id for student_class in classes}
+            if missing:
+                raise CommandError(f'Class ids not found: {", ".join(map(str, sorted(missing)))}')
+
+        started = time.perf_counter()
+        total = 0
+        for student_class in classes:
+            exam_types = kwargs['exam_types'] or list(
+                Result.objects.filter(student_class=student_class).values_list('exam_type', flat=True).distinct().order_by('exam_type')
+            )
+            if not exam_types:
+                continue
+
+            def progress(rendered, count):
+                self.stdout.write(f'\r{student_class}: {rendered}/{count} cards', ending='')
+                self.stdout.flush()
+
+            path, count = generate_report_cards(student_class, exam_types, kwargs['workers'], progress)
+            self.stdout.write('')
+            self.stdout.write(f'{student_class}: {count} cards written to {os.path.join(settings.MEDIA_ROOT, path)}')
+            total += count
+
+        self.stdout.write(self.style.SUCCESS(f'Generated {total} report cards in {time.perf_counter() - started:.1f}s'))
@@ -1,40 +1,171 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
+from django.contrib.auth import get_user_model
+from django import db
+from itertools import islice
 import csv
-from result.models import Result, Student, Class, Subject
-from django.contrib.auth.models import User
+import json
+import multiprocessing
+import os
+import time
+
+from result import grading
+from result.rankings import refresh_rankings
+from result.importing import (
+    ERROR_REPORT_HEADER, IMPORT_COLUMNS, init_import_worker, load_import_lookups,
+    validate_chunk, write_results,
+)
+
 
 class Command(BaseCommand):
-    help = 'Import results from CSV file'
-    
+    help = (
+        'Import results from a CSV file with the columns '
+        'roll_number, subject_code, class_name, exam_type, marks_obtained, total_marks. '
+        'Rows are written in chunks; an interrupted import resumes from its checkpoint file.'
+    )
+
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the CSV file')
-    
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows validated and committed together')
+        parser.add_argument('--workers', type=int, default=1, help='Processes used to parse and validate chunks')
+        parser.add_argument('--user', type=str, help='Username recorded as creator, defaults to the first superuser')
+        parser.add_argument('--checkpoint', type=str, help='Checkpoint file, defaults to <csv_file>.checkpoint')
+        parser.add_argument('--errors', type=str, help='CSV file for rejected lines, defaults to <csv_file>.errors.csv')
+        parser.add_argument('--restart', action='store_true', help='Ignore an existing checkpoint and start from the first row')
+
     def handle(self, *args, **kwargs):
         csv_file = kwargs['csv_file']
-        
-        with open(csv_file, 'r') as file:
+        if not os.path.exists(csv_file):
+            raise CommandError(f'File "{csv_file}" does not exist')
+        if kwargs['chunk_size'] < 1 or kwargs['workers'] < 1:
+            raise CommandError('--chunk-size and --workers must be positive')
+
+        checkpoint_path = kwargs['checkpoint'] or f'{csv_file}.checkpoint'
+        errors_path = kwargs['errors'] or f'{csv_file}.errors.csv'
+        created_by_id = self.get_creator(kwargs['user'])
+
+        progress = {
+            'line': 1, 'writing': 1, 'created': 0, 'resumed': 0, 'skipped': 0, 'errors': 0,
+            'errors_size': 0, 'ranking_keys': [],
+        }
+        if os.path.exists(checkpoint_path) and not kwargs['restart']:
+            with open(checkpoint_path) as file:
+                progress.update(json.load(file))
+            self.stdout.write(f"Resuming after line {progress['line']}")
+            if os.path.exists(errors_path):
+                # Drop the errors of a chunk written after the last checkpoint; it is replayed
+                os.truncate(errors_path, progress['errors_size'])
+        elif os.path.exists(errors_path):
+            os.remove(errors_path)
+
+        lookups = load_import_lookups()
+        table = grading.get_table()
+        bands = list(zip(table.minimums, table.grades, table.gpas))
+
+        started = time.perf_counter()
+        processed = 0
+        with open(csv_file, newline='', encoding='utf-8-sig') as file, \
+                open(errors_path, 'a', newline='', encoding='utf-8') as errors_file:
             reader = csv.DictReader(file)
-            for row in reader:
-                try:
-                    student = Student.objects.get(roll_number=row['roll_number'])
-                    subject = Subject.objects.get(code=row['subject_code'])
-                    student_class = Class.objects.get(name=row['class_name'])
-                    
-                    Result.objects.create(
-                        student=student,
-                        student_class=student_class,
-                        subject=subject,
-                        exam_type=row['exam_type'],
-                        marks_obtained=float(row['marks_obtained']),
-                        total_marks=float(row['total_marks']),
-                        created_by=User.objects.first()  # Or get appropriate user
-                    )
-                    
+            missing = set(IMPORT_COLUMNS) - {'total_marks'} - set(reader.fieldnames or [])
+            if missing:
+                raise CommandError(f'Missing columns: {", ".join(sorted(missing))}')
+
+            errors_writer = csv.writer(errors_file)
+            if errors_file.tell() == 0:
+                errors_writer.writerow(ERROR_REPORT_HEADER)
+
+            # The chunk being written when the last run stopped may have been committed
+            replayed_through = progress['writing']
+            rows = ((line, row) for line, row in enumerate(reader, 2) if line > progress['line'])
+            chunks = iter(lambda: list(islice(rows, kwargs['chunk_size'])), [])
+
+            pool = None
+            if kwargs['workers'] > 1:
+                if 'fork' not in multiprocessing.get_all_start_methods():
+                    raise CommandError('--workers needs the fork start method, which this platform does not support')
+                # Workers never use the database; don't let them inherit open connections
+                db.connections.close_all()
+                pool = multiprocessing.get_context('fork').Pool(
+                    kwargs['workers'], initializer=init_import_worker, initargs=(lookups, bands),
+                )
+                validated = pool.imap(validate_chunk, chunks)
+            else:
+                init_import_worker(lookups, bands)
+                validated = map(validate_chunk, chunks)
+
+            ranking_keys = {tuple(key) for key in progress['ranking_keys']}
+            try:
+                for valid, errors in validated:
+                    last_line = max([entry[0] for entry in valid] + [error[0] for error in errors])
+                    ranking_keys.update((entry[2], entry[4]) for entry in valid)
+                    # Saved before writing, so a run stopped after the commit still
+                    # refreshes these rankings and knows which rows it may have written
+                    progress['writing'] = last_line
+                    progress['ranking_keys'] = sorted(ranking_keys)
+                    self.save_checkpoint(checkpoint_path, progress)
+
+                    created, skipped = write_results(valid, created_by_id)
+                    resumed = [line for line in skipped if line <= replayed_through]
+                    skipped = [line for line in skipped if line > replayed_through]
+
+                    for error in errors:
+                        errors_writer.writerow(error)
+                        if kwargs['verbosity'] > 1:
+                            self.stdout.write(self.style.ERROR(f'Line {error[0]}: {error[3]}'))
+                    for line in skipped:
+                        errors_writer.writerow((line, '', '', 'Result already exists'))
+                    errors_file.flush()
+                    progress['errors_size'] = errors_file.tell()
+
+                    processed += len(valid) + len(errors)
+                    progress['line'] = last_line
+                    progress['created'] += created
+                    progress['resumed'] += len(resumed)
+                    progress['skipped'] += len(skipped)
+                    progress['errors'] += len(errors)
+                    self.save_checkpoint(checkpoint_path, progress)
+
+                    elapsed = time.perf_counter() - started
                     self.stdout.write(
-                        self.style.SUCCESS(f'Successfully imported result for {student.name}')
+                        f"Line {last_line}: {progress['created']} created, {progress['skipped']} skipped, "
+                        f"{progress['errors']} errors ({processed / elapsed:.0f} rows/s)"
                     )
-                    
-                except Exception as e:
-                    self.stdout.write(
-                        self.style.ERROR(f'Error importing result: {str(e)}')
-                    )
\ No newline at end of file
+            finally:
+                if pool is not None:
+                    pool.terminate()
+
+        # Includes the classes and exams written by earlier, interrupted runs
+        refresh_rankings(ranking_keys)
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Imported {progress['created']} results ({progress['skipped']} already existed, "
+                f"{progress['errors']} errors) in {elapsed:.1f}s, {processed / elapsed if elapsed else 0:.0f} rows/s"
+            )
+        )
+        if progress['resumed']:
+            self.stdout.write(f"{progress['resumed']} results were already imported by the interrupted run")
+        if progress['errors'] or progress['skipped']:
+            self.stdout.write(f'Rejected lines were written to {errors_path}')
+
+    def get_creator(self, username):
+        User = get_user_model()
+        if username:
+            try:
+                return User.objects.get(username=username).id
+            except User.DoesNotExist:
+                raise CommandError(f'User "{username}" does not exist')
+        user = User.objects.filter(is_superuser=True).order_by('id').first() or User.objects.order_by('id').first()
+        if user is None:
+            raise CommandError('No user to record as creator; create one or pass --user')
+        return user.id
+
+    def save_checkpoint(self, path, progress):
+        # Written after the chunk is committed; replace atomically so a crash never leaves half a file
+        temporary = f'{path}.tmp'
+        with open(temporary, 'w') as file:
+            json.dump(progress, file)
+        os.replace(temporary, path)
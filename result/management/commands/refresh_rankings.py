@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+import time
+
+from result.rankings import refresh_all_rankings
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the class positions of every class and exam type from the results'
+
+    def handle(self, *args, **kwargs):
+        started = time.perf_counter()
+        written = refresh_all_rankings()
+        elapsed = time.perf_counter() - started
+
+        self.stdout.write(
+            self.style.SUCCESS(f'Ranked {written} students in {elapsed:.2f}s')
+        )
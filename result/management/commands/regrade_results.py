@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+import time
+
+from result.grading import regrade_results
+from result.models import Result
+
+
+class Command(BaseCommand):
+    help = 'Recompute percentage, grade and GPA of existing results from the current grade system'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--class', type=int, nargs='+', dest='classes', help='Only regrade results of these class ids')
+        parser.add_argument('--exam-type', nargs='+', dest='exam_types', choices=[choice[0] for choice in Result.EXAM_TYPES], help='Only regrade these exam types')
+        parser.add_argument('--dry-run', action='store_true', help='Report the changes without writing them')
+
+    def handle(self, *args, **kwargs):
+        results = Result.objects.all()
+        if kwargs['classes']:
+            results = results.filter(student_class_id__in=kwargs['classes'])
+        if kwargs['exam_types']:
+            results = results.filter(exam_type__in=kwargs['exam_types'])
+
+        started = time.perf_counter()
+        changed, transitions = regrade_results(results, dry_run=kwargs['dry_run'])
+        elapsed = time.perf_counter() - started
+
+        for (old_grade, new_grade), count in sorted(transitions.items()):
+            self.stdout.write(f'{old_grade:>3} -> {new_grade:<3} {count:>8}')
+
+        action = 'Would update' if kwargs['dry_run'] else 'Updated'
+        self.stdout.write(self.style.SUCCESS(f'{action} {changed} results in {elapsed:.2f}s'))
@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-17 17:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('result', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClassRanking',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('exam_type', models.CharField(choices=[('midterm', 'Midterm Exam'), ('final', 'Final Exam'), ('quiz', 'Quiz'), ('assignment', 'Assignment')], max_length=20)),
+                ('total_marks', models.DecimalField(decimal_places=2, max_digits=8)),
+                ('average_percentage', models.DecimalField(decimal_places=2, max_digits=5)),
+                ('average_gpa', models.DecimalField(decimal_places=2, max_digits=3)),
+                ('subject_count', models.PositiveIntegerField()),
+                ('position', models.PositiveIntegerField()),
+                ('student_count', models.PositiveIntegerField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('student', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='result.student')),
+                ('student_class', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rankings', to='result.class')),
+            ],
+            options={
+                'ordering': ['student_class', 'exam_type', 'position'],
+                'indexes': [models.Index(fields=['student_class', 'exam_type', 'position'], name='ranking_position_idx')],
+                'unique_together': {('student_class', 'exam_type', 'student')},
+            },
+        ),
+    ]
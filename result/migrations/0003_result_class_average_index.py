@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:02
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('result', '0002_class_ranking'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['student_class', 'exam_type', 'subject', 'percentage'], name='result_class_average_idx'),
+        ),
+    ]
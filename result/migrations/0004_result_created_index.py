@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-17 18:17
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('result', '0003_result_class_average_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='result',
+            index=models.Index(fields=['created_at'], name='result_created_idx'),
+        ),
+    ]
@@ -75,39 +75,51 @@ class Result(models.Model):
     class Meta:
         unique_together = ['student', 'subject', 'exam_type']
         ordering = ['-created_at']
+        indexes = [
+            # Covers the class averages per subject and exam in result.trends
+            models.Index(fields=['student_class', 'exam_type', 'subject', 'percentage'], name='result_class_average_idx'),
+            # The dashboard pages by (created_at, id); see school_management.pagination
+            models.Index(fields=['created_at'], name='result_created_idx'),
+        ]
     
     def __str__(self):
         return f"{self.student.name} - {self.subject.name} - {self.get_exam_type_display()}"
     
-    def save(self, *args, **kwargs):
+    def calculate_grade(self):
         # Calculate percentage
         self.percentage = (self.marks_obtained / self.total_marks) * 100
         
-        # Calculate grade and GPA based on percentage
-        if self.percentage >= 80:
-            self.grade = 'A+'
-            self.gpa = 5.00
-        elif self.percentage >= 70:
-            self.grade = 'A'
-            self.gpa = 4.00
-        elif self.percentage >= 60:
-            self.grade = 'A-'
-            self.gpa = 3.50
-        elif self.percentage >= 50:
-            self.grade = 'B'
-            self.gpa = 3.00
-        elif self.percentage >= 40:
-            self.grade = 'C'
-            self.gpa = 2.00
-        elif self.percentage >= 33:
-            self.grade = 'D'
-            self.gpa = 1.00
-        else:
-            self.grade = 'F'
-            self.gpa = 0.00
-            
+        # Grade and GPA come from the cached GradeSystem table (no query per result)
+        from .grading import grade_for
+        self.grade, self.gpa = grade_for(self.percentage)
+    
+    def save(self, *args, **kwargs):
+        self.calculate_grade()
         super().save(*args, **kwargs)
 
+class ClassRanking(models.Model):
+    # Materialized by result.rankings; one row per student, class and exam type
+    student = models.ForeignKey(Student, on_delete=models.CASCADE, related_name='rankings')
+    student_class = models.ForeignKey(Class, on_delete=models.CASCADE, related_name='rankings')
+    exam_type = models.CharField(max_length=20, choices=Result.EXAM_TYPES)
+    total_marks = models.DecimalField(max_digits=8, decimal_places=2)
+    average_percentage = models.DecimalField(max_digits=5, decimal_places=2)
+    average_gpa = models.DecimalField(max_digits=3, decimal_places=2)
+    subject_count = models.PositiveIntegerField()
+    position = models.PositiveIntegerField()
+    student_count = models.PositiveIntegerField()
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        unique_together = ['student_class', 'exam_type', 'student']
+        ordering = ['student_class', 'exam_type', 'position']
+        indexes = [
+            models.Index(fields=['student_class', 'exam_type', 'position'], name='ranking_position_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.student.name} - {self.get_exam_type_display()} - {self.position}/{self.student_count}"
+
 class GradeSystem(models.Model):
     grade = models.CharField(max_length=2, unique=True)
     min_percentage = models.DecimalField(max_digits=5, decimal_places=2)
@@ -0,0 +1,139 @@
+"""
+Class positions per exam.
+
+``ClassRanking`` holds every student's total marks, averages and position
+within their class for each exam type, so report cards and the dashboard read
+a rank with a single indexed lookup instead of sorting the class per request.
+Positions are computed with ``RANK() OVER (PARTITION BY class, exam ORDER BY
+total DESC)`` in the grouping query where the database supports window
+functions, and in Python otherwise. Rankings of a class and exam are rebuilt
+after any of its results change (see ``result.signals``); bulk paths call
+``refresh_rankings`` themselves.
+"""
+from collections import defaultdict
+import functools
+from decimal import Decimal
+import weakref
+
+from django.db import connection, transaction
+from django.db.models import Avg, Count, F, Q, Sum, Window
+from django.db.models.functions import Rank
+
+from .models import ClassRanking, Result
+from .statistics import bump_results_version
+
+BULK_BATCH_SIZE = 500
+
+TWO_PLACES = Decimal('0.01')
+
+
+def ranking_rows(results):
+    """
+    Return one dict per (class, exam type, student) of ``results`` with its position.
+
+    Ties share a position, as in ``RANK()``.
+    """
+    rows = results.values('student_class_id', 'exam_type', 'student_id').annotate(
+        total=Sum('marks_obtained'),
+        average_percentage=Avg('percentage'),
+        average_gpa=Avg('gpa'),
+        subject_count=Count('id'),
+    ).order_by()
+
+    if connection.features.supports_over_clause:
+        return list(rows.annotate(position=Window(
+            Rank(),
+            partition_by=[F('student_class_id'), F('exam_type')],
+            order_by=Sum('marks_obtained').desc(),
+        )))
+
+    rows = list(rows)
+    groups = defaultdict(list)
+    for row in rows:
+        groups[(row['student_class_id'], row['exam_type'])].append(row)
+    for group in groups.values():
+        group.sort(key=lambda row: row['total'], reverse=True)
+        for index, row in enumerate(group):
+            if index and row['total'] == group[index - 1]['total']:
+                row['position'] = group[index - 1]['position']
+            else:
+                row['position'] = index + 1
+    return rows
+
+
+def refresh_rankings(keys):
+    """Rebuild the rankings of every ``(class_id, exam_type)`` in ``keys``."""
+    keys = set(keys)
+    if not keys:
+        return 0
+
+    condition = Q(pk__in=[])
+    for class_id, exam_type in keys:
+        condition |= Q(student_class_id=class_id, exam_type=exam_type)
+
+    rows = ranking_rows(Result.objects.filter(condition))
+    student_counts = defaultdict(int)
+    for row in rows:
+        student_counts[(row['student_class_id'], row['exam_type'])] += 1
+
+    rankings = [
+        ClassRanking(
+            student_id=row['student_id'],
+            student_class_id=row['student_class_id'],
+            exam_type=row['exam_type'],
+            total_marks=row['total'],
+            average_percentage=Decimal(str(row['average_percentage'])).quantize(TWO_PLACES),
+            average_gpa=Decimal(str(row['average_gpa'])).quantize(TWO_PLACES),
+            subject_count=row['subject_count'],
+            position=row['position'],
+            student_count=student_counts[(row['student_class_id'], row['exam_type'])],
+        )
+        for row in rows
+    ]
+
+    with transaction.atomic():
+        ClassRanking.objects.filter(condition).delete()
+        ClassRanking.objects.bulk_create(rankings, batch_size=BULK_BATCH_SIZE)
+        # Tabulation sheets read the positions; expire them once the new rows are visible
+        class_ids = {class_id for class_id, exam_type in keys}
+        transaction.on_commit(lambda: bump_results_version(class_ids))
+    return len(rankings)
+
+
+def refresh_all_rankings():
+    """Rebuild every ranking from scratch."""
+    keys = Result.objects.values_list('student_class_id', 'exam_type').distinct().order_by()
+    with transaction.atomic():
+        ClassRanking.objects.all().delete()
+        return refresh_rankings(keys)
+
+
+def schedule_refresh(class_id, exam_type):
+    """
+    Rebuild the rankings of one class and exam once the current transaction commits.
+
+    Keys scheduled in the same transaction are collected into one set on the
+    connection, so a cascade or a loop over many results of a class rebuilds
+    it once: the first key registers the callback and the callback empties
+    the set. A rollback discards the callback, and with it the only strong
+    reference to it, so keys whose callback is gone are stale and dropped.
+    """
+    connection = transaction.get_connection()
+    pending = getattr(connection, 'pending_ranking_keys', None)
+    if pending and connection.pending_ranking_callback() is None:
+        pending.clear()
+    if pending is None:
+        pending = connection.pending_ranking_keys = set()
+    if not pending:
+        callback = functools.partial(refresh_pending, connection)
+        connection.pending_ranking_callback = weakref.ref(callback)
+        pending.add((class_id, exam_type))
+        transaction.on_commit(callback)
+    else:
+        pending.add((class_id, exam_type))
+
+
+def refresh_pending(connection):
+    keys = set(connection.pending_ranking_keys)
+    connection.pending_ranking_keys.clear()
+    refresh_rankings(keys)
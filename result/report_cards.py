@@ -0,0 +1,154 @@
+"""
+Batch report cards.
+
+All results of a class and exam are loaded with one query, the class
+positions with another, and grouped per student in memory. Cards are then
+rendered to standalone, printable HTML pages, optionally across a pool of
+worker processes, and written to a ZIP archive under ``MEDIA_ROOT``.
+"""
+from collections import defaultdict
+from datetime import datetime
+from itertools import islice
+import multiprocessing
+import os
+import re
+import zipfile
+
+from django import db
+from django.conf import settings
+from django.template.loader import render_to_string
+
+from .grading import get_table
+from .models import ClassRanking, Result
+
+REPORT_CARD_DIR = 'report_cards'
+
+RENDER_CHUNK_SIZE = 50
+
+EXAM_LABELS = dict(Result.EXAM_TYPES)
+
+
+def report_card_data(student_class, exam_type):
+    """
+    Return one card context per student with results in ``student_class`` for ``exam_type``.
+
+    Contexts hold plain values only, so they can be sent to worker processes.
+    """
+    positions = {
+        student_id: (position, student_count)
+        for student_id, position, student_count in ClassRanking.objects.filter(
+            student_class=student_class, exam_type=exam_type,
+        ).values_list('student_id', 'position', 'student_count')
+    }
+    results = Result.objects.filter(
+        student_class=student_class, exam_type=exam_type,
+    ).order_by('student__roll_number', 'subject__name').values_list(
+        'student_id', 'student__name', 'student__roll_number', 'student__father_name',
+        'student__mother_name', 'student__section', 'subject__name', 'subject__code',
+        'marks_obtained', 'total_marks', 'percentage', 'grade', 'gpa',
+    )
+
+    students = {}
+    subjects = defaultdict(list)
+    for (student_id, name, roll_number, father_name, mother_name, section,
+         subject, code, marks_obtained, total_marks, percentage, grade, gpa) in results.iterator(chunk_size=2000):
+        if student_id not in students:
+            students[student_id] = {
+                'name': name,
+                'roll_number': roll_number,
+                'father_name': father_name,
+                'mother_name': mother_name,
+                'section': section,
+            }
+        subjects[student_id].append({
+            'subject': subject,
+            'code': code,
+            'marks_obtained': marks_obtained,
+            'total_marks': total_marks,
+            'percentage': percentage,
+            'grade': grade,
+            'gpa': gpa,
+        })
+
+    table = get_table()
+    school_name = getattr(settings, 'SCHOOL_NAME', 'Your School Name')
+    cards = []
+    for student_id, student in students.items():
+        rows = subjects[student_id]
+        total_marks = sum(row['total_marks'] for row in rows)
+        marks_obtained = sum(row['marks_obtained'] for row in rows)
+        percentage = marks_obtained * 100 / total_marks if total_marks else 0
+        position, student_count = positions.get(student_id, (None, None))
+        cards.append({
+            'school_name': school_name,
+            'exam': EXAM_LABELS.get(exam_type, exam_type),
+            'class_name': str(student_class),
+            'student': student,
+            'results': rows,
+            'marks_obtained': marks_obtained,
+            'total_marks': total_marks,
+            'percentage': round(percentage, 2),
+            'gpa': round(sum(row['gpa'] for row in rows) / len(rows), 2),
+            'grade': table.overall_grade(percentage, [row['gpa'] for row in rows]),
+            'failed_subjects': sum(1 for row in rows if row['gpa'] == 0),
+            'position': position,
+            'student_count': student_count,
+        })
+    return cards
+
+
+def card_filename(card):
+    name = re.sub(r'[^\w-]+', '_', card['student']['name']).strip('_')
+    return f"{card['student']['roll_number']}_{name}.html"
+
+
+def render_cards(cards):
+    """Render a chunk of card contexts; runs in the worker processes."""
+    return [(card_filename(card), render_to_string('result/report_card.html', card)) for card in cards]
+
+
+def generate_report_cards(student_class, exam_types, workers=1, progress=None):
+    """
+    Render the report cards of ``student_class`` for each of ``exam_types`` into a ZIP.
+
+    ``progress`` is called with ``(rendered, total)`` after each chunk. Returns
+    ``(path, count)`` with the archive path relative to ``MEDIA_ROOT``.
+    """
+    cards = []
+    for exam_type in exam_types:
+        for card in report_card_data(student_class, exam_type):
+            cards.append((exam_type, card))
+
+    class_slug = re.sub(r'[^\w-]+', '_', str(student_class)).strip('_')
+    relative_path = os.path.join(
+        REPORT_CARD_DIR, f"{class_slug}_{'-'.join(exam_types)}_{datetime.now():%Y%m%d%H%M%S}.zip"
+    )
+    path = os.path.join(settings.MEDIA_ROOT, relative_path)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+
+    folders = [exam_type for exam_type, card in cards]
+    contexts = iter([card for exam_type, card in cards])
+    chunks = iter(lambda: list(islice(contexts, RENDER_CHUNK_SIZE)), [])
+
+    pool = None
+    if workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+        # Rendering never uses the database; don't let workers inherit open connections
+        db.connections.close_all()
+        pool = multiprocessing.get_context('fork').Pool(workers)
+        rendered_chunks = pool.imap(render_cards, chunks)
+    else:
+        rendered_chunks = map(render_cards, chunks)
+
+    rendered = 0
+    try:
+        with zipfile.ZipFile(path, 'w', zipfile.ZIP_DEFLATED) as archive:
+            for chunk in rendered_chunks:
+                for filename, html in chunk:
+                    archive.writestr(f'{folders[rendered]}/{filename}', html)
+                    rendered += 1
+                if progress:
+                    progress(rendered, len(cards))
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return relative_path, rendered
@@ -1,7 +1,11 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_init, post_save, post_delete
+from django.db.models import Avg
 from django.dispatch import receiver
 from django.contrib.auth.models import User
-from .models import Student, Result
+from . import grading
+from .rankings import schedule_refresh
+from .statistics import bump_results_version
+from .models import Student, Result, GradeSystem
 
 @receiver(post_save, sender=Result)
 def update_student_performance(sender, instance, created, **kwargs):
@@ -15,4 +19,44 @@ def update_student_performance(sender, instance, created, **kwargs):
         
         # You can store this in a StudentProfile model if you have one
         # For now, we'll just log it or you can extend the Student model
-        print(f"Student {instance.student.name} now has average: {avg_percentage:.2f}%")
\ No newline at end of file
+        print(f"Student {instance.student.name} now has average: {avg_percentage:.2f}%")
+
+@receiver(post_save, sender=GradeSystem)
+@receiver(post_delete, sender=GradeSystem)
+def reload_grading_table(sender, **kwargs):
+    """
+    Drop the cached grading table so the next result is graded with the new bands
+    """
+    grading.invalidate()
+
+@receiver(post_init, sender=Result)
+def remember_ranking_key(sender, instance, **kwargs):
+    # The class and exam as stored, so moving a result also refreshes its old ranking
+    instance._original_ranking_key = (
+        (instance.__dict__.get('student_class_id'), instance.__dict__.get('exam_type'))
+        if instance.pk else None
+    )
+
+@receiver(post_save, sender=Result)
+@receiver(post_delete, sender=Result)
+def expire_result_statistics(sender, instance, **kwargs):
+    """
+    Bump the results versions so cached statistics, class sheets and trends are recomputed
+    """
+    class_ids = [instance.student_class_id]
+    if instance._original_ranking_key:
+        class_ids.append(instance._original_ranking_key[0])
+    bump_results_version(class_ids, [instance.student_id])
+
+@receiver(post_save, sender=Result)
+@receiver(post_delete, sender=Result)
+def refresh_class_ranking(sender, instance, **kwargs):
+    """
+    Rebuild the class positions affected by a result once the change is committed
+    """
+    keys = {(instance.student_class_id, instance.exam_type)}
+    if instance._original_ranking_key:
+        keys.add(instance._original_ranking_key)
+    instance._original_ranking_key = (instance.student_class_id, instance.exam_type)
+    for class_id, exam_type in keys:
+        schedule_refresh(class_id, exam_type)
@@ -0,0 +1,130 @@
+"""
+Aggregate statistics for the results dashboard.
+
+Total, average, the full grade distribution, pass rate and per-subject
+averages all come from one query grouped by subject with a conditional
+count per grade; the overall figures are summed from the subject rows.
+The statistics are cached under the filter parameters and a results
+version number, with further versions per class and per student for the
+caches of one class or student. Any ``Result`` write bumps the versions (see
+``result.signals``; bulk paths call ``bump_results_version`` themselves).
+
+The versions live in the cache, so they only reach the processes that share
+it: web workers and the management commands must all use the shared
+``CACHES`` backend configured in the settings. A per-process cache such as
+``LocMemCache`` would keep serving other processes' stale entries until they
+time out.
+"""
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+import time
+
+RESULTS_VERSION_CACHE_KEY = 'results_version'
+
+CLASS_VERSION_CACHE_KEY = 'results_version:class:{}'
+
+STUDENT_VERSION_CACHE_KEY = 'results_version:student:{}'
+
+STATISTICS_CACHE_TIMEOUT = 600
+
+
+def get_version(key):
+    version = cache.get(key)
+    if version is None:
+        # Start from the clock so a version evicted from the cache is never reused
+        cache.add(key, time.time_ns(), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    # A fresh clock value rather than incr(), which file and database caches
+    # implement as a non-atomic get and set: two processes bumping at once
+    # would otherwise both write the same version
+    cache.set(key, time.time_ns(), None)
+
+
+def results_version():
+    return get_version(RESULTS_VERSION_CACHE_KEY)
+
+
+def class_version(class_id):
+    """Version of the results of one class, bumped whenever one of them changes."""
+    return get_version(CLASS_VERSION_CACHE_KEY.format(class_id))
+
+
+def student_version(student_id):
+    """Version of the results of one student, bumped whenever one of them changes."""
+    return get_version(STUDENT_VERSION_CACHE_KEY.format(student_id))
+
+
+def bump_results_version(class_ids=(), student_ids=()):
+    """
+    Invalidate cached statistics and the caches of ``class_ids`` and
+    ``student_ids``; call after writing results.
+    """
+    bump_version(RESULTS_VERSION_CACHE_KEY)
+    for class_id in set(class_ids):
+        bump_version(CLASS_VERSION_CACHE_KEY.format(class_id))
+    for student_id in set(student_ids):
+        bump_version(STUDENT_VERSION_CACHE_KEY.format(student_id))
+
+
+def compute_statistics(results):
+    """Return the statistics of the ``results`` queryset from a single query."""
+    # grading imports this module to expire statistics after a regrade
+    from . import grading
+
+    table = grading.get_table()
+    grades = list(reversed(table.grades))
+    if table.fail_grade not in grades:
+        grades.append(table.fail_grade)
+
+    rows = results.values('subject_id', 'subject__name').annotate(
+        count=Count('id'),
+        percentage_sum=Sum('percentage'),
+        **{f'grade_{index}': Count('id', filter=Q(grade=grade)) for index, grade in enumerate(grades)},
+    ).order_by('subject__name')
+
+    total = 0
+    percentage_sum = 0
+    distribution = dict.fromkeys(grades, 0)
+    subject_averages = []
+    for row in rows:
+        total += row['count']
+        percentage_sum += row['percentage_sum'] or 0
+        for index, grade in enumerate(grades):
+            distribution[grade] += row[f'grade_{index}']
+        subject_averages.append({
+            'subject_id': row['subject_id'],
+            'subject': row['subject__name'],
+            'count': row['count'],
+            'average_percentage': round((row['percentage_sum'] or 0) / row['count'], 2),
+        })
+
+    failed = distribution[table.fail_grade]
+    return {
+        'total': total,
+        'average_percentage': round(percentage_sum / total, 2) if total else 0,
+        'grade_distribution': list(distribution.items()),
+        'top_grade_count': distribution[table.top_grade],
+        'failed_count': failed,
+        'pass_rate': round((total - failed) * 100 / total, 2) if total else 0,
+        'subject_averages': subject_averages,
+    }
+
+
+def results_statistics(results, filters):
+    """
+    Return the statistics of ``results``, cached under ``filters``.
+
+    ``filters`` must identify the queryset: the same filters always have to
+    produce the same ``results``.
+    """
+    params = ':'.join(f'{name}={value}' for name, value in sorted(filters.items()))
+    cache_key = f'results_statistics:{results_version()}:{params}'
+    statistics = cache.get(cache_key)
+    if statistics is None:
+        statistics = compute_statistics(results)
+        cache.set(cache_key, statistics, STATISTICS_CACHE_TIMEOUT)
+    return statistics
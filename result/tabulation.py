@@ -0,0 +1,118 @@
+"""
+Tabulation sheets.
+
+A tabulation sheet has one row per student and one column per subject of a
+class and exam, followed by total, percentage, GPA, grade and position. The
+results are fetched with a single ``values_list`` query and pivoted into a
+dense NumPy matrix; totals and GPAs are computed on the arrays, grades by
+the overall-grade rule in ``result.grading`` and positions are read from
+``ClassRanking``, so the sheet agrees with report cards. The pivot is
+cached under the class's results version (see ``result.statistics``),
+which is bumped again once rankings are rebuilt, so it is rebuilt only
+after a result of the class changes.
+"""
+from django.core.cache import cache
+import numpy as np
+
+from .grading import get_table
+from .models import ClassRanking, Result
+from .statistics import class_version
+
+TABULATION_CACHE_TIMEOUT = 60 * 60
+
+
+class Tabulation:
+    """
+    The pivoted marks of one class and exam.
+
+    ``marks``, ``total_marks`` and ``gpas`` are ``students x subjects`` arrays
+    with NaN where a student has no result for a subject; ``positions`` holds
+    each student's class position, or None when not ranked yet.
+    """
+    def __init__(self, students, subjects, marks, total_marks, gpas, positions):
+        self.students = students
+        self.subjects = subjects
+        self.marks = marks
+
+        present = ~np.isnan(marks)
+        subject_counts = present.sum(axis=1)
+        self.totals = np.nansum(marks, axis=1)
+        full_marks = np.nansum(total_marks, axis=1)
+        self.percentages = np.divide(
+            self.totals * 100, full_marks, out=np.zeros_like(self.totals), where=full_marks > 0
+        )
+        gpa_sums = np.nansum(gpas, axis=1)
+        self.average_gpas = np.divide(
+            gpa_sums, subject_counts, out=np.zeros_like(gpa_sums), where=subject_counts > 0
+        )
+
+        self.grades = get_table().overall_grades(self.percentages, ((gpas == 0) & present).any(axis=1))
+        self.positions = positions
+
+    def __len__(self):
+        return len(self.students)
+
+    def header(self):
+        return (
+            ['Roll No', 'Name']
+            + [f'{name} ({code})' for subject_id, name, code in self.subjects]
+            + ['Total', 'Percentage', 'GPA', 'Grade', 'Position']
+        )
+
+    def rows(self, start=0, stop=None):
+        """Yield the sheet rows of students ``start``..``stop`` as plain values."""
+        for index in range(start, len(self) if stop is None else min(stop, len(self))):
+            student_id, roll_number, name = self.students[index]
+            yield (
+                [roll_number, name]
+                + [None if np.isnan(mark) else float(mark) for mark in self.marks[index]]
+                + [
+                    float(self.totals[index]),
+                    round(float(self.percentages[index]), 2),
+                    round(float(self.average_gpas[index]), 2),
+                    self.grades[index],
+                    self.positions[index],
+                ]
+            )
+
+
+def build_tabulation(student_class, exam_type):
+    """Pivot the results of ``student_class`` for ``exam_type``, with its positions."""
+    results = list(Result.objects.filter(
+        student_class=student_class, exam_type=exam_type,
+    ).order_by().values_list(
+        'student_id', 'student__roll_number', 'student__name',
+        'subject_id', 'subject__name', 'subject__code',
+        'marks_obtained', 'total_marks', 'gpa',
+    ))
+
+    students = sorted({row[:3] for row in results}, key=lambda student: student[1])
+    subjects = sorted({row[3:6] for row in results}, key=lambda subject: subject[1])
+    student_index = {student[0]: index for index, student in enumerate(students)}
+    subject_index = {subject[0]: index for index, subject in enumerate(subjects)}
+
+    shape = (len(students), len(subjects))
+    marks, total_marks, gpas = np.full(shape, np.nan), np.full(shape, np.nan), np.full(shape, np.nan)
+    if results:
+        rows = np.fromiter((student_index[row[0]] for row in results), dtype=np.intp, count=len(results))
+        columns = np.fromiter((subject_index[row[3]] for row in results), dtype=np.intp, count=len(results))
+        marks[rows, columns] = [float(row[6]) for row in results]
+        total_marks[rows, columns] = [float(row[7]) for row in results]
+        gpas[rows, columns] = [float(row[8]) for row in results]
+
+    ranked = dict(ClassRanking.objects.filter(
+        student_class=student_class, exam_type=exam_type,
+    ).values_list('student_id', 'position'))
+    positions = [ranked.get(student[0]) for student in students]
+    return Tabulation(students, subjects, marks, total_marks, gpas, positions)
+
+
+def get_tabulation(student_class, exam_type):
+    """Return the tabulation of ``student_class`` for ``exam_type``, cached until one of its results changes."""
+    cache_key = f'tabulation:{student_class.pk}:{exam_type}:{class_version(student_class.pk)}'
+    tabulation = cache.get(cache_key)
+    if tabulation is None:
+        tabulation = build_tabulation(student_class, exam_type)
+        cache.set(cache_key, tabulation, TABULATION_CACHE_TIMEOUT)
+    return tabulation
+
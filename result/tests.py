@@ -1,3 +1,60 @@
+from datetime import date
+from decimal import Decimal
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
 
-# Create your tests here.
+from .grading import regrade_results
+from .models import Class, Result, Student, Subject
+
+
+class RegradeResultsTests(TestCase):
+    def setUp(self):
+        self.user = user = get_user_model().objects.create_user(username='student1', password='password')
+        self.student_class = Class.objects.create(name='Class 8')
+        self.subject = Subject.objects.create(name='Mathematics', code='MATH8', class_associated=self.student_class)
+        self.student = Student.objects.create(
+            user=user,
+            roll_number='801',
+            name='Student One',
+            date_of_birth=date(2010, 1, 1),
+            father_name='Father',
+            mother_name='Mother',
+            address='Address',
+            phone='0123456789',
+            current_class=self.student_class,
+            section='A',
+        )
+
+    def create_result(self, marks_obtained, total_marks):
+        return Result.objects.create(
+            student=self.student,
+            student_class=self.student_class,
+            subject=self.subject,
+            exam_type='final',
+            marks_obtained=Decimal(marks_obtained),
+            total_marks=Decimal(total_marks),
+            created_by=self.user,
+        )
+
+    def test_fractional_percentage_is_left_alone(self):
+        result = self.create_result('134', '150')
+
+        self.assertEqual(regrade_results(Result.objects.all(), dry_run=True), (0, {}))
+        self.assertEqual(regrade_results(Result.objects.all()), (0, {}))
+
+        result.refresh_from_db()
+        self.assertEqual(result.percentage, Decimal('89.33'))
+        self.assertEqual(result.grade, 'A+')
+
+    def test_stale_grade_is_recomputed_from_fractional_percentage(self):
+        result = self.create_result('134', '150')
+        Result.objects.filter(pk=result.pk).update(percentage=Decimal('89.00'), grade='A', gpa=Decimal('4.00'))
+
+        self.assertEqual(regrade_results(Result.objects.all(), dry_run=True), (1, {('A', 'A+'): 1}))
+        self.assertEqual(regrade_results(Result.objects.all()), (1, {('A', 'A+'): 1}))
+
+        result.refresh_from_db()
+        self.assertEqual(result.percentage, Decimal('89.33'))
+        self.assertEqual(result.grade, 'A+')
+        self.assertEqual(result.gpa, Decimal('5.00'))
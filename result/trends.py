@@ -0,0 +1,114 @@
+"""
+Per-student performance trends.
+
+Every result of a student is read with one query, each annotated with the
+average percentage of the student's class in the same subject and exam
+through a correlated subquery. From these rows the trend is built in
+Python: each result's change since the student's previous exam in the same
+subject and its difference from the class average, plus one summary per
+exam across all subjects.
+
+The trend is cached per student together with the versions it was built
+from: the student's own results version and those of every class involved
+(see ``result.statistics``). It is served while they all still match, so it
+is rebuilt after the student's results change or, because of the class
+averages, after any result of those classes changes (a regrade included).
+"""
+from django.core.cache import cache
+from django.db.models import Avg, OuterRef, Subquery
+
+from .models import Result
+from .statistics import CLASS_VERSION_CACHE_KEY, STUDENT_VERSION_CACHE_KEY, class_version, student_version
+
+TREND_CACHE_TIMEOUT = 60 * 60
+
+EXAM_LABELS = dict(Result.EXAM_TYPES)
+
+
+def build_trend(student_id):
+    """Return the performance trend of one student, from a single query."""
+    class_average = Result.objects.filter(
+        student_class=OuterRef('student_class'),
+        subject=OuterRef('subject'),
+        exam_type=OuterRef('exam_type'),
+    ).order_by().values('student_class').annotate(average=Avg('percentage')).values('average')
+
+    rows = Result.objects.filter(student_id=student_id).annotate(
+        class_average=Subquery(class_average),
+    ).order_by('created_at', 'id').values(
+        'id', 'student_class_id', 'exam_type', 'subject_id', 'subject__name', 'marks_obtained',
+        'total_marks', 'percentage', 'grade', 'gpa', 'remarks', 'created_at', 'class_average',
+    )
+
+    entries = []
+    exams = {}
+    previous = {}
+    for row in rows:
+        class_average = round(float(row['class_average'] or 0), 2)
+        percentage = float(row['percentage'])
+        last = previous.get(row['subject_id'])
+        entry = {
+            'id': row['id'],
+            'student_class_id': row['student_class_id'],
+            'exam_type': row['exam_type'],
+            'exam_label': EXAM_LABELS.get(row['exam_type'], row['exam_type']),
+            'subject_id': row['subject_id'],
+            'subject_name': row['subject__name'],
+            'marks_obtained': row['marks_obtained'],
+            'total_marks': row['total_marks'],
+            'percentage': row['percentage'],
+            'grade': row['grade'],
+            'gpa': row['gpa'],
+            'remarks': row['remarks'],
+            'created_at': row['created_at'],
+            'class_average': class_average,
+            'vs_class': round(percentage - class_average, 2),
+            'change': round(percentage - float(last['percentage']), 2) if last else None,
+        }
+        entries.append(entry)
+        previous[row['subject_id']] = entry
+
+        exam = exams.setdefault(row['exam_type'], {
+            'exam_type': row['exam_type'],
+            'exam_label': entry['exam_label'],
+            'date': row['created_at'],
+            'entries': [],
+        })
+        exam['entries'].append(entry)
+
+    # Exams in the order they were first held
+    summaries = []
+    for exam in exams.values():
+        exam_entries = exam.pop('entries')
+        count = len(exam_entries)
+        exam['subject_count'] = count
+        exam['average_percentage'] = round(sum(float(entry['percentage']) for entry in exam_entries) / count, 2)
+        exam['average_gpa'] = round(sum(float(entry['gpa']) for entry in exam_entries) / count, 2)
+        exam['class_average'] = round(sum(entry['class_average'] for entry in exam_entries) / count, 2)
+        exam['vs_class'] = round(exam['average_percentage'] - exam['class_average'], 2)
+        exam['change'] = (
+            round(exam['average_percentage'] - summaries[-1]['average_percentage'], 2) if summaries else None
+        )
+        summaries.append(exam)
+
+    return {'entries': entries, 'exams': summaries}
+
+
+def performance_trend(student_id):
+    """Return the cached performance trend of one student, rebuilding it when stale."""
+    cache_key = f'performance_trend:{student_id}'
+    cached = cache.get(cache_key)
+    if cached is not None:
+        versions = cache.get_many(cached['versions'])
+        if versions == cached['versions']:
+            return cached['trend']
+
+    # Versions are read before the query, so a write while it runs leaves the entry stale
+    versions = {STUDENT_VERSION_CACHE_KEY.format(student_id): student_version(student_id)}
+    class_ids = set(Result.objects.filter(student_id=student_id).values_list('student_class_id', flat=True).distinct().order_by())
+    for class_id in class_ids:
+        versions[CLASS_VERSION_CACHE_KEY.format(class_id)] = class_version(class_id)
+
+    trend = build_trend(student_id)
+    cache.set(cache_key, {'versions': versions, 'trend': trend}, TREND_CACHE_TIMEOUT)
+    return trend
@@ -14,7 +14,12 @@ urlpatterns = [
     
     # Bulk operations
     path('bulk-upload/', views.bulk_upload_results, name='bulk_result_upload'),
+    path('bulk-upload/errors/<str:token>/', views.download_import_errors, name='result_import_errors'),
     path('download-template/', views.download_result_template, name='result_template'),
+    path('export/', views.export_results, name='export_results'),
+    
+    # Tabulation sheet
+    path('tabulation/', views.tabulation_sheet, name='tabulation_sheet'),
     
     # Grade system
     path('grade-system/', views.manage_grade_system, name='grade_system'),
@@ -1,30 +1,45 @@
 from django.shortcuts import render, get_object_or_404, redirect
 from django.contrib.auth.decorators import login_required, user_passes_test
 from django.contrib import messages
-from django.http import JsonResponse, HttpResponse
+from django.http import JsonResponse, HttpResponse, FileResponse, StreamingHttpResponse
+from django.db import IntegrityError
 from django.db.models import Q, Avg, Count, Sum
 from django.core.paginator import Paginator
+from django.urls import reverse
+from django.utils.html import format_html
 import csv
 import io
+import tempfile
 
-from .models import Result, Student, Class, Subject, GradeSystem
-from .forms import ResultForm, BulkResultUploadForm, ResultFilterForm
+from accounts.roles import get_roles
+from school_management.pagination import KeysetPaginator
+from school_management.streaming import write_xlsx
+
+from .models import Result, Student, Class, Subject, GradeSystem, ClassRanking
+from .forms import ResultForm, BulkResultUploadForm, ResultFilterForm, TabulationForm, ResultExportForm
+from .grading import overall_grade
+from .importing import import_uploaded_results, load_error_report, store_error_report
+from .statistics import results_statistics
+from .exports import HEADER as EXPORT_HEADER, csv_lines, result_rows
+from .tabulation import get_tabulation
+from .trends import performance_trend
 
 def is_teacher(user):
-    return user.groups.filter(name='Teachers').exists() or user.is_staff
+    return get_roles(user).is_teacher
 
 def is_student(user):
-    return user.groups.filter(name='Students').exists()
+    return get_roles(user).is_student
 
 @login_required
 def results_dashboard(request):
     # Check if user is teacher or admin
-    if not (request.user.is_staff or is_teacher(request.user)):
+    if not request.user.roles.is_teacher:
         messages.error(request, "You don't have permission to access this page.")
         return redirect('my_results')
     
     form = ResultFilterForm(request.GET or None)
     results = Result.objects.all().select_related('student', 'subject', 'student_class')
+    filters = {}
     
     if form.is_valid():
         class_filter = form.cleaned_data.get('class_filter')
@@ -33,35 +48,37 @@ def results_dashboard(request):
         
         if class_filter:
             results = results.filter(student_class=class_filter)
+            filters['class'] = class_filter.pk
         if exam_filter:
             results = results.filter(exam_type=exam_filter)
+            filters['exam'] = exam_filter
         if student_filter:
             results = results.filter(student=student_filter)
+            filters['student'] = student_filter.pk
     
-    # Statistics
-    total_results = results.count()
-    average_percentage = results.aggregate(avg=Avg('percentage'))['avg'] or 0
-    top_grade_count = results.filter(grade='A+').count()
-    failed_count = results.filter(grade='F').count()
+    # Statistics, from one cached query
+    statistics = results_statistics(results, filters)
     
-    # Pagination
-    paginator = Paginator(results, 25)
-    page_number = request.GET.get('page')
-    page_obj = paginator.get_page(page_number)
+    # Pagination, by keyset; the total is already known from the statistics
+    paginator = KeysetPaginator(results.order_by('-created_at', '-id'), 25, count=statistics['total'])
+    page_obj = paginator.get_page(request.GET)
     
     context = {
         'results': page_obj,
         'form': form,
-        'total_results': total_results,
-        'average_percentage': round(average_percentage, 2),
-        'top_grade_count': top_grade_count,
-        'failed_count': failed_count,
+        'total_results': statistics['total'],
+        'average_percentage': statistics['average_percentage'],
+        'top_grade_count': statistics['top_grade_count'],
+        'failed_count': statistics['failed_count'],
+        'pass_rate': statistics['pass_rate'],
+        'grade_distribution': statistics['grade_distribution'],
+        'subject_averages': statistics['subject_averages'],
         'classes': Class.objects.all(),
     }
     return render(request, 'result/results_dashboard.html', context)
 
 @login_required
-@user_passes_test(lambda u: u.is_staff or is_teacher(u))
+@user_passes_test(is_teacher)
 def enter_result(request):
     if request.method == 'POST':
         form = ResultForm(request.POST)
@@ -83,7 +100,7 @@ def enter_result(request):
     return render(request, 'result/enter_result.html', context)
 
 @login_required
-@user_passes_test(lambda u: u.is_staff or is_teacher(u))
+@user_passes_test(is_teacher)
 def edit_result(request, result_id):
     result = get_object_or_404(Result, id=result_id)
     
@@ -106,7 +123,7 @@ def edit_result(request, result_id):
     return render(request, 'result/edit_result.html', context)
 
 @login_required
-@user_passes_test(lambda u: u.is_staff or is_teacher(u))
+@user_passes_test(is_teacher)
 def delete_result(request, result_id):
     result = get_object_or_404(Result, id=result_id)
     if request.method == 'POST':
@@ -124,39 +141,35 @@ def my_results(request):
         messages.error(request, "Student profile not found.")
         return redirect('home')
     
-    results = Result.objects.filter(student=student).select_related('subject', 'student_class')
+    # Every result with its class average and change, from the cached trend
+    trend = performance_trend(student.id)
+    results = list(reversed(trend['entries']))
     
     # Calculate statistics
-    total_subjects = results.values('subject').distinct().count()
-    average_percentage = results.aggregate(avg=Avg('percentage'))['avg'] or 0
-    
-    # Calculate overall grade based on average percentage
-    if average_percentage >= 80:
-        overall_grade = 'A+'
-    elif average_percentage >= 70:
-        overall_grade = 'A'
-    elif average_percentage >= 60:
-        overall_grade = 'A-'
-    elif average_percentage >= 50:
-        overall_grade = 'B'
-    elif average_percentage >= 40:
-        overall_grade = 'C'
-    elif average_percentage >= 33:
-        overall_grade = 'D'
-    else:
-        overall_grade = 'F'
+    total_subjects = len({result['subject_id'] for result in results})
+    average_percentage = (
+        sum(result['percentage'] for result in results) / len(results) if results else 0
+    )
+    
+    # Overall grade by the same rule as report cards and tabulation sheets
+    overall = overall_grade(average_percentage, [result['gpa'] for result in results])
     
     # Get final results for report card
-    final_results = results.filter(exam_type='final')
+    final_results = [result for result in results if result['exam_type'] == 'final']
     
     # Calculate total GPA for final results
-    if final_results.exists():
-        total_gpa = final_results.aggregate(avg_gpa=Avg('gpa'))['avg_gpa'] or 0
+    if final_results:
+        total_gpa = sum(result['gpa'] for result in final_results) / len(final_results)
     else:
         total_gpa = 0
     
-    # Simple position calculation (this would need more complex logic in real scenario)
-    position_in_class = "Not Available"  # This would require additional logic
+    # Positions come from the materialized class rankings
+    rankings = list(ClassRanking.objects.filter(student=student).select_related('student_class'))
+    final_ranking = next((ranking for ranking in rankings if ranking.exam_type == 'final'), None)
+    if final_ranking:
+        position_in_class = f"{final_ranking.position} of {final_ranking.student_count}"
+    else:
+        position_in_class = "Not Available"
     
     context = {
         'student': student,
@@ -164,38 +177,49 @@ def my_results(request):
         'final_results': final_results,
         'total_subjects': total_subjects,
         'average_percentage': round(average_percentage, 2),
-        'overall_grade': overall_grade,
+        'overall_grade': overall,
         'position_in_class': position_in_class,
+        'rankings': rankings,
+        'exam_trend': trend['exams'],
         'total_gpa': round(total_gpa, 2),
     }
     return render(request, 'result/my_results.html', context)
 
 @login_required
 def result_detail(request, result_id):
-    result = get_object_or_404(Result, id=result_id)
+    result = get_object_or_404(Result.objects.select_related('student', 'student_class', 'subject'), id=result_id)
     
     # Check if user has permission to view this result
-    if not (request.user.is_staff or is_teacher(request.user) or 
-            (is_student(request.user) and result.student.user == request.user)):
+    roles = request.user.roles
+    if not (roles.is_teacher or (roles.is_student and result.student.user_id == request.user.id)):
         messages.error(request, "You don't have permission to view this result.")
         return redirect('my_results')
     
-    # Get performance history for this student in the same subject
-    performance_history = Result.objects.filter(
-        student=result.student, 
-        subject=result.subject
-    ).exclude(id=result_id).order_by('-created_at')[:10]
+    # Performance history for this student in the same subject, from the cached trend
+    trend = performance_trend(result.student_id)
+    performance_history = [
+        entry for entry in reversed(trend['entries'])
+        if entry['subject_id'] == result.subject_id and entry['id'] != result.id
+    ][:10]
+    
+    ranking = ClassRanking.objects.filter(
+        student_id=result.student_id,
+        student_class_id=result.student_class_id,
+        exam_type=result.exam_type,
+    ).first()
     
     context = {
         'result': result,
+        'ranking': ranking,
         'performance_history': performance_history,
+        'exam_trend': trend['exams'],
         'school_name': 'Your School Name',  # This should come from settings
         'academic_year': '2024',  # This should be dynamic
     }
     return render(request, 'result/result_detail.html', context)
 
 @login_required
-@user_passes_test(lambda u: u.is_staff or is_teacher(u))
+@user_passes_test(is_teacher)
 def bulk_upload_results(request):
     if request.method == 'POST':
         form = BulkResultUploadForm(request.POST, request.FILES)
@@ -205,76 +229,27 @@ def bulk_upload_results(request):
             subject_choice = form.cleaned_data['subject_choice']
             exam_type = form.cleaned_data['exam_type']
             
-            # Read CSV file
             try:
-                data_set = csv_file.read().decode('UTF-8')
-                io_string = io.StringIO(data_set)
-                reader = csv.reader(io_string, delimiter=',')
-                
-                success_count = 0
-                error_count = 0
-                errors = []
-                
-                # Skip header
-                next(reader, None)
-                
-                for row_num, row in enumerate(reader, 2):  # Start from line 2 for error reporting
-                    if len(row) >= 2:
-                        try:
-                            roll_number = row[0].strip()
-                            marks_obtained = float(row[1])
-                            
-                            # Find student
-                            try:
-                                student = Student.objects.get(
-                                    roll_number=roll_number, 
-                                    current_class=class_choice
-                                )
-                            except Student.DoesNotExist:
-                                errors.append(f"Line {row_num}: Student with roll number {roll_number} not found in selected class")
-                                error_count += 1
-                                continue
-                            
-                            # Check if result already exists
-                            if Result.objects.filter(
-                                student=student, 
-                                subject=subject_choice, 
-                                exam_type=exam_type
-                            ).exists():
-                                errors.append(f"Line {row_num}: Result already exists for {student.name}")
-                                error_count += 1
-                                continue
-                            
-                            # Create result
-                            Result.objects.create(
-                                student=student,
-                                student_class=class_choice,
-                                subject=subject_choice,
-                                exam_type=exam_type,
-                                marks_obtained=marks_obtained,
-                                total_marks=100,  # Default total marks
-                                created_by=request.user
-                            )
-                            success_count += 1
-                            
-                        except ValueError:
-                            errors.append(f"Line {row_num}: Invalid marks format")
-                            error_count += 1
-                        except Exception as e:
-                            errors.append(f"Line {row_num}: {str(e)}")
-                            error_count += 1
-                
-                if success_count > 0:
-                    messages.success(request, f'Successfully uploaded {success_count} results!')
-                if error_count > 0:
-                    messages.warning(request, f'{error_count} results could not be uploaded.')
-                    for error in errors[:10]:  # Show first 10 errors
+                report = import_uploaded_results(csv_file, class_choice, subject_choice, exam_type, request.user)
+            except (UnicodeDecodeError, csv.Error) as e:
+                messages.error(request, f'Error processing CSV file: {str(e)}')
+            except IntegrityError:
+                # Another upload created some of the same results in the meantime
+                messages.error(request, 'Some of these results were uploaded at the same time by someone else. Nothing was saved; please upload the file again.')
+            else:
+                if report.created > 0:
+                    messages.success(request, f'Successfully uploaded {report.created} results!')
+                if report.errors:
+                    token = store_error_report(request.session, report)
+                    messages.warning(request, format_html(
+                        '{} results could not be uploaded. <a href="{}">Download the error report</a>',
+                        len(report.errors),
+                        reverse('result_import_errors', args=[token]),
+                    ))
+                    for error in report.error_messages()[:10]:  # Show first 10 errors
                         messages.error(request, error)
                 
                 return redirect('results_dashboard')
-                
-            except Exception as e:
-                messages.error(request, f'Error processing CSV file: {str(e)}')
     else:
         form = BulkResultUploadForm()
     
@@ -284,7 +259,19 @@ def bulk_upload_results(request):
     return render(request, 'result/bulk_upload.html', context)
 
 @login_required
-@user_passes_test(lambda u: u.is_staff or is_teacher(u))
+@user_passes_test(is_teacher)
+def download_import_errors(request, token):
+    errors_csv = load_error_report(request.session, token)
+    if errors_csv is None:
+        messages.error(request, 'The error report is no longer available. Please upload the file again.')
+        return redirect('bulk_result_upload')
+    
+    response = HttpResponse(errors_csv, content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="result_import_errors.csv"'
+    return response
+
+@login_required
+@user_passes_test(is_teacher)
 def download_result_template(request):
     # Create a CSV template file
     response = HttpResponse(content_type='text/csv')
@@ -298,6 +285,70 @@ def download_result_template(request):
     
     return response
 
+@login_required
+@user_passes_test(is_teacher)
+def tabulation_sheet(request):
+    form = TabulationForm(request.GET or None)
+    if not form.is_valid():
+        return render(request, 'result/tabulation_sheet.html', {'form': form})
+    
+    student_class = form.cleaned_data['student_class']
+    exam_type = form.cleaned_data['exam_type']
+    tabulation = get_tabulation(student_class, exam_type)
+    filename = f"tabulation_{student_class.id}_{exam_type}"
+    
+    if form.cleaned_data.get('format') == 'xlsx':
+        output = tempfile.TemporaryFile()
+        write_xlsx(tabulation.rows(), output, tabulation.header(), f"{student_class} {exam_type}")
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=f'{filename}.xlsx')
+    
+    if form.cleaned_data.get('format') == 'csv':
+        response = StreamingHttpResponse(csv_lines(tabulation.rows(), header=tabulation.header()), content_type='text/csv')
+        response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+        return response
+    
+    # Only the rows of the current page are built
+    paginator = Paginator(range(len(tabulation)), 100)
+    page_obj = paginator.get_page(request.GET.get('page'))
+    query = request.GET.copy()
+    query.pop('page', None)
+    
+    context = {
+        'form': form,
+        'student_class': student_class,
+        'exam_type': dict(Result.EXAM_TYPES)[exam_type],
+        'header': tabulation.header(),
+        'rows': tabulation.rows(page_obj.start_index() - 1, page_obj.end_index()),
+        'page_obj': page_obj,
+        'query': query.urlencode(),
+    }
+    return render(request, 'result/tabulation_sheet.html', context)
+
+@login_required
+@user_passes_test(is_teacher)
+def export_results(request):
+    form = ResultExportForm(request.GET or None)
+    if 'download' not in request.GET or not form.is_valid():
+        return render(request, 'result/export_results.html', {'form': form})
+    
+    student_class = form.cleaned_data.get('student_class')
+    exam_type = form.cleaned_data.get('exam_type')
+    filename = f"results_{student_class.id if student_class else 'all'}_{exam_type or 'all'}"
+    rows = result_rows(student_class=student_class, exam_type=exam_type)
+    
+    if form.cleaned_data.get('format') == 'xlsx':
+        # Write-only rows are flushed to disk as they are appended, so only
+        # the finished file is served
+        output = tempfile.TemporaryFile()
+        write_xlsx(rows, output, EXPORT_HEADER, 'Results')
+        output.seek(0)
+        return FileResponse(output, as_attachment=True, filename=f'{filename}.xlsx')
+    
+    response = StreamingHttpResponse(csv_lines(rows), content_type='text/csv')
+    response['Content-Disposition'] = f'attachment; filename="{filename}.csv"'
+    return response
+
 @login_required
 @user_passes_test(lambda u: u.is_staff)
 def manage_grade_system(request):
@@ -0,0 +1,241 @@
+"""
+Keyset pagination.
+
+Django's ``Paginator`` pages with ``OFFSET``: the database reads and throws
+away every row before the requested page, so page 500 costs five hundred
+pages of work, and every page first counts the whole result set.
+``KeysetPaginator`` remembers the sort key of the last row shown instead and
+asks for the rows after it (``WHERE date < %s OR (date = %s AND id < %s)``).
+With an index on the ordering that is a short range scan however deep the
+page, so page 500 is as fast as page 1.
+
+Pages are addressed by an opaque ``cursor`` parameter rather than a page
+number, so a list offers first/previous/next links only. The primary key is
+appended to every ordering so the key is unique and no row is skipped or
+repeated between pages. The total shown next to the links is passed in when
+the caller already has it (the result statistics, the attendance summary);
+otherwise it is counted once per query and cached for a few minutes, so it
+may lag behind rows added in the meantime.
+"""
+import base64
+import binascii
+import hashlib
+import json
+
+from django.core.cache import cache
+from django.core.exceptions import EmptyResultSet, ValidationError
+from django.db.models import Q
+from django.http import QueryDict
+from django.utils.functional import cached_property
+
+CURSOR_PARAM = 'cursor'
+
+COUNT_CACHE_TIMEOUT = 5 * 60
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+def encode_cursor(values, backwards=False):
+    # str() keeps microseconds, which DjangoJSONEncoder would drop
+    data = json.dumps([values, backwards], default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(data.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the ``(values, backwards)`` stored in ``cursor``."""
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values, backwards = data
+    except (ValueError, TypeError, binascii.Error):
+        raise InvalidCursor(cursor)
+    if not isinstance(values, list):
+        raise InvalidCursor(cursor)
+    return values, bool(backwards)
+
+
+def cached_count(queryset):
+    """Return ``queryset.count()``, cached for ``COUNT_CACHE_TIMEOUT`` per distinct query."""
+    queryset = queryset.order_by()
+    try:
+        sql, params = queryset.query.sql_with_params()
+    except EmptyResultSet:
+        return 0
+    digest = hashlib.md5(f'{queryset.db}:{sql}:{params!r}'.encode()).hexdigest()
+    cache_key = f'keyset_count:{digest}'
+    count = cache.get(cache_key)
+    if count is None:
+        count = queryset.count()
+        cache.set(cache_key, count, COUNT_CACHE_TIMEOUT)
+    return count
+
+
+def key_value(row, path):
+    if isinstance(row, dict):
+        return row[path]
+    for attribute in path.split('__'):
+        row = getattr(row, attribute)
+    return row
+
+
+class KeysetPaginator:
+    """
+    Page ``queryset`` by its ordering, ``per_page`` rows at a time.
+
+    The ordering is taken from ``ordering`` or else from the queryset (its
+    ``order_by()`` or the model's ``Meta.ordering``) and must be made of
+    plain field names; the key fields must not be NULL. Pass ``count`` when
+    the total is already known.
+    """
+    def __init__(self, queryset, per_page, ordering=None, count=None):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self._count = count
+
+        ordering = list(ordering or queryset.query.order_by or queryset.model._meta.ordering)
+        if not all(isinstance(field, str) and field.lstrip('-') and field != '?' for field in ordering):
+            raise ValueError(f'Keyset pagination needs plain field names to order by, got {ordering!r}.')
+        self.keys = [(field.lstrip('-'), field.startswith('-')) for field in ordering]
+        if not any(path in ('pk', queryset.model._meta.pk.name) for path, descending in self.keys):
+            self.keys.append(('pk', self.keys[-1][1] if self.keys else False))
+
+    @cached_property
+    def count(self):
+        if self._count is not None:
+            return self._count
+        return cached_count(self.queryset)
+
+    @property
+    def count_is_approximate(self):
+        return self._count is None
+
+    def ordered(self, backwards=False):
+        return self.queryset.order_by(*[
+            ('-' if descending != backwards else '') + path for path, descending in self.keys
+        ])
+
+    def seek(self, values, backwards=False):
+        """The condition selecting the rows after ``values``, or before them when ``backwards``."""
+        condition = Q()
+        equal = Q()
+        for (path, descending), value in zip(self.keys, values):
+            lookup = 'lt' if descending != backwards else 'gt'
+            condition |= equal & Q(**{f'{path}__{lookup}': value})
+            equal &= Q(**{path: value})
+        # A bound on the leading key alone, so an index range scan can start at the cursor
+        path, descending = self.keys[0]
+        bound = Q(**{f'{path}__{"lte" if descending != backwards else "gte"}': values[0]})
+        return bound & condition
+
+    def cursor(self, row, backwards=False):
+        return encode_cursor([key_value(row, path) for path, descending in self.keys], backwards)
+
+    def page(self, cursor=None):
+        """Return the page that ``cursor`` points to, or the first page; raises ``InvalidCursor``."""
+        if not cursor:
+            return self._first_page()
+
+        values, backwards = decode_cursor(cursor)
+        if len(values) != len(self.keys):
+            raise InvalidCursor(cursor)
+        try:
+            queryset = self.ordered(backwards).filter(self.seek(values, backwards))
+        except (ValidationError, ValueError, TypeError):
+            raise InvalidCursor(cursor)
+        rows = list(queryset[:self.per_page + 1])
+        more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if not rows:
+            # The rows past the cursor are gone; start over
+            return self._first_page()
+
+        if backwards:
+            rows.reverse()
+            return KeysetPage(rows, self, has_next=True, has_previous=more)
+        return KeysetPage(rows, self, has_next=more, has_previous=True)
+
+    def _first_page(self):
+        rows = list(self.ordered()[:self.per_page + 1])
+        return KeysetPage(rows[:self.per_page], self, has_next=len(rows) > self.per_page, has_previous=False)
+
+    def get_page(self, params):
+        """
+        Return the page for a request's query parameters (``request.GET``).
+
+        A missing or invalid cursor gives the first page. The page keeps
+        ``params`` so its links carry the list's filters along.
+        """
+        try:
+            page = self.page(params.get(CURSOR_PARAM))
+        except InvalidCursor:
+            page = self.page()
+        page.params = params
+        return page
+
+
+class KeysetPage:
+    def __init__(self, object_list, paginator, has_next, has_previous):
+        self.object_list = object_list
+        self.paginator = paginator
+        self._has_next = has_next
+        self._has_previous = has_previous
+        self.params = None
+
+    def __repr__(self):
+        return f'<KeysetPage of {len(self.object_list)} rows>'
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __getitem__(self, index):
+        return self.object_list[index]
+
+    def has_next(self):
+        return self._has_next
+
+    def has_previous(self):
+        return self._has_previous
+
+    def has_other_pages(self):
+        return self._has_next or self._has_previous
+
+    @property
+    def next_cursor(self):
+        return self.paginator.cursor(self.object_list[-1]) if self._has_next else None
+
+    @property
+    def previous_cursor(self):
+        return self.paginator.cursor(self.object_list[0], backwards=True) if self._has_previous else None
+
+    def _query(self, cursor):
+        params = self.params.copy() if self.params is not None else QueryDict(mutable=True)
+        params.pop('page', None)
+        params.pop(CURSOR_PARAM, None)
+        if cursor:
+            params[CURSOR_PARAM] = cursor
+        return params.urlencode()
+
+    @property
+    def first_query(self):
+        """The query string of the first page, with the list's other parameters."""
+        return self._query(None)
+
+    @property
+    def next_query(self):
+        return self._query(self.next_cursor)
+
+    @property
+    def previous_query(self):
+        return self._query(self.previous_cursor)
+
+
+class KeysetPaginationMixin:
+    """Page a ``ListView`` with ``KeysetPaginator``; ``paginate_by`` still sets the page size."""
+    def paginate_queryset(self, queryset, page_size):
+        paginator = KeysetPaginator(queryset, page_size)
+        page = paginator.get_page(self.request.GET)
+        return paginator, page, page.object_list, page.has_other_pages()
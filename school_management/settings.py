@@ -93,6 +93,36 @@ DATABASES = {
     }
 }
 
+# Closed years of attendance can be archived into a separate SQLite file by
+# setting ATTENDANCE_ARCHIVE_DB to its path; by default they stay in db.sqlite3.
+# Run `python manage.py migrate --database=archive` once after enabling it.
+ATTENDANCE_ARCHIVE_DATABASE = 'default'
+if config('ATTENDANCE_ARCHIVE_DB', default=''):
+    DATABASES['archive'] = {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': config('ATTENDANCE_ARCHIVE_DB'),
+    }
+    ATTENDANCE_ARCHIVE_DATABASE = 'archive'
+
+DATABASE_ROUTERS = ['attendance.routers.AttendanceArchiveRouter']
+
+# Cached statistics, tabulations, trends and summaries are invalidated
+# from whichever process changes the data (any web worker or a management
+# command), so every process must share one cache. Files under cache/ by
+# default; set REDIS_URL to use Redis instead.
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(BASE_DIR, 'cache', 'django'),
+        'OPTIONS': {'MAX_ENTRIES': 10000},
+    }
+}
+if config('REDIS_URL', default=''):
+    CACHES['default'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': config('REDIS_URL'),
+    }
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -138,6 +168,9 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'staticfiles')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Attendance analytics column cache
+ATTENDANCE_ANALYTICS_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'attendance_analytics')
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
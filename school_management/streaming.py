@@ -0,0 +1,39 @@
+"""
+Helpers for streaming large exports.
+
+``csv.writer`` normally writes to a file; given an ``Echo`` it hands each
+formatted line back instead, so a generator can yield the lines straight
+into a ``StreamingHttpResponse`` without building the file in memory.
+``write_xlsx`` does the same for spreadsheets with an openpyxl write-only
+workbook, and ``CountedRows`` lets a command report how many rows went out.
+"""
+import openpyxl
+
+
+class Echo:
+    """A file-like object whose ``write`` just returns the value, for csv.writer."""
+    def write(self, value):
+        return value
+
+
+class CountedRows:
+    """Wraps exported rows so the caller can report how many were written."""
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+
+def write_xlsx(rows, output, header, title):
+    """Write ``header`` and ``rows`` to ``output`` (a path or binary file) as a write-only workbook."""
+    workbook = openpyxl.Workbook(write_only=True)
+    # Excel rejects sheet names longer than 31 characters
+    sheet = workbook.create_sheet(title[:31])
+    sheet.append(header)
+    for row in rows:
+        sheet.append(row)
+    workbook.save(output)
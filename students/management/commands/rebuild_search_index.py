@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from students.search import rebuild_search_index, uses_search_table
+
+
+class Command(BaseCommand):
+    help = 'Repopulate the student search index from the students table'
+
+    def handle(self, *args, **kwargs):
+        if not uses_search_table():
+            self.stdout.write('This database searches students through its own indexes; nothing to rebuild')
+            return
+
+        indexed = rebuild_search_index()
+
+        self.stdout.write(self.style.SUCCESS(f'Indexed {indexed} students'))
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+from students.search import SEARCH_COLUMNS, SEARCH_TABLE, rebuild_search_index
+
+
+def create_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE {SEARCH_TABLE} USING fts5({', '.join(SEARCH_COLUMNS)}, tokenize='trigram')"
+        )
+        rebuild_search_index(schema_editor)
+    elif connection.vendor == 'postgresql':
+        # icontains compiles to UPPER(column) LIKE UPPER(%s)
+        schema_editor.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+        for column in SEARCH_COLUMNS:
+            schema_editor.execute(
+                f'CREATE INDEX IF NOT EXISTS students_student_{column}_trgm '
+                f'ON students_student USING gin (UPPER({column}) gin_trgm_ops)'
+            )
+
+
+def drop_search_index(apps, schema_editor):
+    connection = schema_editor.connection
+    if connection.vendor == 'sqlite':
+        schema_editor.execute(f'DROP TABLE IF EXISTS {SEARCH_TABLE}')
+    elif connection.vendor == 'postgresql':
+        for column in SEARCH_COLUMNS:
+            schema_editor.execute(f'DROP INDEX IF EXISTS students_student_{column}_trgm')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('students', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,118 @@
+"""
+Student search index.
+
+On SQLite, names, roll numbers and phone numbers are copied into an FTS5
+table with the ``trigram`` tokenizer. Any substring of three or more
+characters, in any script (Bengali names included), is then found through
+the index instead of four ``LIKE '%q%'`` scans. The rows are kept in sync by
+``post_save``/``post_delete`` on ``Student`` (see ``students.signals``);
+writes that bypass the signals (``update()``, ``bulk_create``, raw SQL) are
+caught up by ``manage.py rebuild_search_index``, which repopulates the table
+from scratch. The migration fills it the same way.
+
+On PostgreSQL the migration creates ``pg_trgm`` GIN indexes on the same
+columns, which serve the ORM's ``icontains`` lookups directly, so there is
+no side table to maintain. Other backends, and queries shorter than a
+trigram, fall back to plain ``icontains``.
+"""
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Student
+
+SEARCH_TABLE = 'students_student_search'
+
+SEARCH_COLUMNS = ['first_name', 'last_name', 'roll_number', 'phone']
+
+MIN_INDEXED_LENGTH = 3
+
+TYPEAHEAD_LIMIT = 10
+
+
+def uses_search_table():
+    return connection.vendor == 'sqlite'
+
+
+def match_expression(query):
+    # A single quoted phrase: FTS5 syntax characters in the query match literally
+    return '"{}"'.format(query.replace('"', '""'))
+
+
+def contains_q(query):
+    condition = Q()
+    for column in SEARCH_COLUMNS:
+        condition |= Q(**{f'{column}__icontains': query})
+    return condition
+
+
+def search_students(queryset, query):
+    """Filter ``queryset`` to the students whose name, roll number or phone contains ``query``."""
+    query = query.strip()
+    if not query:
+        return queryset
+    if not uses_search_table() or len(query) < MIN_INDEXED_LENGTH:
+        return queryset.filter(contains_q(query))
+    return queryset.filter(pk__in=RawSQL(
+        f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s', [match_expression(query)]
+    ))
+
+
+def typeahead(query, limit=TYPEAHEAD_LIMIT):
+    """
+    Return up to ``limit`` matching students as dicts.
+
+    Matches come in index order rather than by relevance: ranking every
+    match of a common name costs far more than the typeahead can afford.
+    """
+    query = query.strip()
+    if not query:
+        return []
+
+    fields = ['id', 'first_name', 'last_name', 'roll_number', 'grade__name', 'grade__section']
+    if not uses_search_table() or len(query) < MIN_INDEXED_LENGTH:
+        return list(Student.objects.filter(contains_q(query)).order_by('roll_number').values(*fields)[:limit])
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s LIMIT %s',
+            [match_expression(query), limit],
+        )
+        ids = [row[0] for row in cursor.fetchall()]
+    students = {student['id']: student for student in Student.objects.filter(pk__in=ids).values(*fields)}
+    return [students[pk] for pk in ids if pk in students]
+
+
+def index_student(student):
+    if not uses_search_table():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [student.pk])
+        cursor.execute(
+            f'INSERT INTO {SEARCH_TABLE} (rowid, {", ".join(SEARCH_COLUMNS)}) VALUES (%s, %s, %s, %s, %s)',
+            [student.pk] + [getattr(student, column) or '' for column in SEARCH_COLUMNS],
+        )
+
+
+def unindex_student(student_id):
+    if not uses_search_table():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE} WHERE rowid = %s', [student_id])
+
+
+def rebuild_search_index(schema_editor=None):
+    """
+    Repopulate the search table from ``students_student``; returns the number of rows indexed.
+
+    Pass the ``schema_editor`` when running inside a migration.
+    """
+    db = schema_editor.connection if schema_editor else connection
+    if db.vendor != 'sqlite':
+        return 0
+    columns = ', '.join(SEARCH_COLUMNS)
+    sources = ', '.join(f"COALESCE({column}, '')" for column in SEARCH_COLUMNS)
+    with db.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {SEARCH_TABLE}')
+        cursor.execute(f'INSERT INTO {SEARCH_TABLE} (rowid, {columns}) SELECT id, {sources} FROM students_student')
+        return cursor.rowcount
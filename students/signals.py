@@ -1,7 +1,8 @@
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_delete, post_save, pre_delete
 from django.dispatch import receiver
 from django.contrib.auth.models import User
 from .models import Student, AcademicHistory, Fee
+from .search import index_student, unindex_student
 from django.utils import timezone
 
 
@@ -34,4 +35,14 @@ def update_fee_status(sender, instance, **kwargs):
 def delete_associated_records(sender, instance, **kwargs):
     # Delete associated records when student is deleted
     # You might want to implement soft delete instead
-    pass
\ No newline at end of file
+    pass
+
+
+@receiver(post_save, sender=Student)
+def update_search_index(sender, instance, **kwargs):
+    index_student(instance)
+
+
+@receiver(post_delete, sender=Student)
+def remove_from_search_index(sender, instance, **kwargs):
+    unindex_student(instance.pk)
@@ -40,4 +40,5 @@ urlpatterns = [
     # API URLs for AJAX
     path('api/students-by-grade/', views.get_students_by_grade, name='api_students_by_grade'),
     path('api/student-counts/', views.get_student_counts, name='api_student_counts'),
+    path('api/search/', views.student_search, name='api_student_search'),
 ]
\ No newline at end of file
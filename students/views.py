@@ -1,6 +1,7 @@
 from django.shortcuts import render, get_object_or_404, redirect
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, TemplateView
+from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.contrib import messages
 from django.db.models import Count, Q, Sum
@@ -10,14 +11,17 @@ import pandas as pd
 import json
 from datetime import datetime
 
+from attendance.periods import month_range, range_q
+from school_management.pagination import KeysetPaginationMixin
 from .models import Student, Guardian, Fee, Document, AcademicHistory, Grade, Attendance
+from .search import TYPEAHEAD_LIMIT, search_students, typeahead
 from .forms import (
     StudentForm, GuardianForm, FeeForm, DocumentForm, AcademicHistoryForm,
     BulkUploadForm, PromoteStudentsForm
 )
 
 
-class StudentListView(LoginRequiredMixin, ListView):
+class StudentListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Student
     template_name = 'students/student_list.html'
     context_object_name = 'students'
@@ -39,12 +43,7 @@ class StudentListView(LoginRequiredMixin, ListView):
         # Search functionality
         search_query = self.request.GET.get('search')
         if search_query:
-            queryset = queryset.filter(
-                Q(first_name__icontains=search_query) |
-                Q(last_name__icontains=search_query) |
-                Q(roll_number__icontains=search_query) |
-                Q(phone__icontains=search_query)
-            )
+            queryset = search_students(queryset, search_query)
         
         return queryset.order_by('grade__name', 'roll_number')
     
@@ -127,7 +126,7 @@ class GuardianUpdateView(LoginRequiredMixin, UpdateView):
         return super().form_valid(form)
 
 
-class FeeListView(LoginRequiredMixin, ListView):
+class FeeListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Fee
     template_name = 'students/fee_list.html'
     context_object_name = 'fees'
@@ -434,9 +433,8 @@ class StudentPortalView(LoginRequiredMixin, TemplateView):
             current_year = timezone.now().year
             
             attendance_data = Attendance.objects.filter(
+                range_q('date', *month_range(current_year, current_month)),
                 student=student,
-                date__month=current_month,
-                date__year=current_year
             )
             
             context['attendance_summary'] = {
@@ -522,8 +520,7 @@ class StudentStatisticsView(LoginRequiredMixin, TemplateView):
         
         for month in range(1, 13):
             count = Student.objects.filter(
-                admission_date__year=current_year,
-                admission_date__month=month
+                range_q('admission_date', *month_range(current_year, month))
             ).count()
             
             monthly_data.append({
@@ -552,6 +549,25 @@ def get_students_by_grade(request):
     return JsonResponse(student_list, safe=False)
 
 
+@login_required
+def student_search(request):
+    query = request.GET.get('q', '')
+    try:
+        limit = max(1, min(int(request.GET.get('limit', TYPEAHEAD_LIMIT)), 50))
+    except ValueError:
+        limit = TYPEAHEAD_LIMIT
+    
+    matches = [{
+        'id': student['id'],
+        'name': f"{student['first_name']} {student['last_name']}",
+        'roll_number': student['roll_number'],
+        'grade': student['grade__name'],
+        'section': student['grade__section'],
+        'url': reverse('students:student_detail', kwargs={'pk': student['id']}),
+    } for student in typeahead(query, limit)]
+    return JsonResponse(matches, safe=False)
+
+
 def get_student_counts(request):
     total = Student.objects.count()
     active = Student.objects.filter(status='Active').count()
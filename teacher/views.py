@@ -8,6 +8,7 @@ from django.utils import timezone
 from datetime import date, timedelta
 import json
 
+from attendance.models import AbsenteeRisk
 from .models import Teacher, ClassSchedule, Assignment, Attendance, StudentResult, Notice
 from .forms import (
     UserRegistrationForm, TeacherForm, ClassScheduleForm, 
@@ -157,10 +158,16 @@ def teacher_portal(request):
     # Get recent notices
     recent_notices = Notice.objects.filter(teacher=teacher, is_published=True).order_by('-created_at')[:3]
     
+    # Students flagged by the nightly detect_absentees job
+    chronic_absentees = AbsenteeRisk.objects.filter(is_chronic=True).select_related(
+        'student__class_info'
+    ).order_by('-current_streak', '-absence_rate')[:10]
+    
     context = {
         'teacher': teacher,
         'today_schedule': today_schedule,
         'recent_notices': recent_notices,
+        'chronic_absentees': chronic_absentees,
         'total_classes': total_classes,
         'total_students': total_students,
         'today_classes': today_classes,